@@ -9,31 +9,34 @@ export async function GET(request: NextRequest) {
   try {
     requireAuth(request)
 
+    // Вместе с отправленными - рассылки в очереди и в процессе (с прогрессом)
     const broadcasts = await prisma.broadcastMessage.findMany({
-      where: {
-        isSent: true,
-      },
       orderBy: {
-        sentAt: 'desc',
+        createdAt: 'desc',
       },
       take: 50, // Последние 50 рассылок
     })
 
-    // Извлекаем количество из title, если есть
     return NextResponse.json(
       createApiResponse({
         broadcasts: broadcasts.map(b => {
-          // Пытаемся извлечь количество из title (формат: "Рассылка 1234 пользователям")
+          // Старые рассылки без счетчиков: количество из title (формат: "Рассылка 1234 пользователям")
           const match = b.title.match(/Рассылка (\d+) пользователям/)
-          const sentCount = match ? parseInt(match[1]) : null
+          const sentCount = b.sentCount || (match ? parseInt(match[1]) : null)
           
           return {
             id: b.id,
             title: b.title,
             message: b.message,
+            isSent: b.isSent,
             sentAt: b.sentAt,
             createdAt: b.createdAt,
+            startedAt: b.startedAt,
+            updatedAt: b.updatedAt,
             sentCount,
+            errorCount: b.errorCount,
+            blockedCount: b.blockedCount,
+            totalUsers: b.totalUsers,
           }
         }),
       })
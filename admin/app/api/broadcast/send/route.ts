@@ -4,7 +4,7 @@ import { prisma } from '@/lib/prisma'
 
 export const dynamic = 'force-dynamic'
 
-// Отправка рассылки всем пользователям
+// Постановка рассылки всем пользователям в очередь
 export async function POST(request: NextRequest) {
   try {
     requireAuth(request)
@@ -19,78 +19,31 @@ export async function POST(request: NextRequest) {
       )
     }
 
-    const botToken = process.env.BOT_TOKEN
+    // Рассылку отправляет бот (telegram_bot/broadcast_worker.py): здесь только ставим
+    // ее в очередь (isSent = false), прогресс виден в истории рассылок
+    const totalUsers = await prisma.botUser.count()
 
-    if (!botToken) {
-      return NextResponse.json(
-        createApiResponse(null, 'BOT_TOKEN not configured'),
-        { status: 500 }
-      )
-    }
-
-    // Получаем всех пользователей
-    const users = await prisma.botUser.findMany({
-      select: {
-        userId: true,
-      },
-    })
-
-    if (users.length === 0) {
+    if (totalUsers === 0) {
       return NextResponse.json(
         createApiResponse(null, 'Нет пользователей для рассылки'),
         { status: 400 }
       )
     }
 
-    let successCount = 0
-    let errorCount = 0
-
-    // Отправляем сообщение всем пользователям
-    for (const user of users) {
-      try {
-        const sendMessageUrl = `https://api.telegram.org/bot${botToken}/sendMessage`
-        const telegramResponse = await fetch(sendMessageUrl, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            chat_id: user.userId.toString(),
-            text: message,
-            parse_mode: 'HTML'
-          })
-        })
-
-        const telegramData = await telegramResponse.json()
-
-        if (telegramData.ok) {
-          successCount++
-        } else {
-          errorCount++
-        }
-      } catch (error) {
-        errorCount++
-      }
-    }
-
-    // Сохраняем в историю рассылок
-    const broadcastTitle = `Рассылка ${successCount} пользователям - ${new Date().toLocaleString('ru-RU')}`
-    await prisma.broadcastMessage.create({
+    const broadcast = await prisma.broadcastMessage.create({
       data: {
-        title: broadcastTitle,
+        title: `Рассылка от ${new Date().toLocaleString('ru-RU')}`,
         message: message,
-        isSent: true,
-        sentAt: new Date(),
+        isSent: false,
       },
     })
 
     return NextResponse.json(
       createApiResponse({
         success: true,
-        message: `Рассылка завершена. Успешно: ${successCount}, Ошибок: ${errorCount}`,
-        sentCount: successCount,
-        errorCount: errorCount,
-        totalUsers: users.length,
+        message: `Рассылка поставлена в очередь (${totalUsers} пользователей)`,
+        broadcastId: broadcast.id,
+        totalUsers,
       })
     )
   } catch (error: any) {
@@ -2,6 +2,19 @@ import { NextRequest, NextResponse } from 'next/server'
 import { prisma } from '@/lib/prisma'
 import { createApiResponse } from '@/lib/api-helpers'
 
+// Ответ на повтор заявки с тем же ключом идемпотентности
+function existingRequestResponse(id: number) {
+  const response = NextResponse.json(
+    createApiResponse({
+      id,
+      transactionId: id,
+      message: 'Заявка уже создана',
+    })
+  )
+  response.headers.set('Access-Control-Allow-Origin', '*')
+  return response
+}
+
 // API для создания заявок из внешних источников (мини-приложение, бот и т.д.)
 export async function OPTIONS() {
   return new NextResponse(null, {
@@ -35,6 +48,10 @@ export async function POST(request: NextRequest) {
       receipt_photo, // base64 строка фото чека
     } = body
 
+    // Ключ идемпотентности: повторная отправка той же заявки (outbox бота) не создает дубль
+    const idempotencyKey: string | null =
+      body.idempotency_key || request.headers.get('idempotency-key') || null
+
     // Определяем user_id (пробуем разные варианты)
     // Приоритет: telegram_user_id > userId > user_id > playerId
     const finalUserId = telegram_user_id || userId || user_id || playerId
@@ -54,7 +71,8 @@ export async function POST(request: NextRequest) {
 
     // Если user_id не передан, используем playerId как userId (для тестирования)
     // Но лучше использовать telegram_user_id если он доступен
-    if (!finalUserId || !type || !amount) {
+    // amount = 0 допустим для вывода: сумму указывает админ
+    if (!finalUserId || !type || amount === undefined || amount === null || amount === '') {
       console.error('❌ Payment API: Missing required fields', { 
         userId, 
         user_id, 
@@ -107,22 +125,42 @@ export async function POST(request: NextRequest) {
       bank
     })
 
-    const newRequest = await prisma.request.create({
-      data: {
-        userId: userIdBigInt,
-        username: telegram_username,
-        firstName: telegram_first_name,
-        lastName: telegram_last_name,
-        bookmaker,
-        accountId: finalAccountId?.toString(),
-        amount: parseFloat(amount),
-        requestType: type,
-        bank,
-        phone,
-        status: 'pending',
-        photoFileUrl: receipt_photo || null, // Сохраняем base64 фото чека
-      },
-    })
+    if (idempotencyKey) {
+      const existing = await prisma.request.findUnique({ where: { idempotencyKey } })
+      if (existing) {
+        return existingRequestResponse(existing.id)
+      }
+    }
+
+    let newRequest
+    try {
+      newRequest = await prisma.request.create({
+        data: {
+          userId: userIdBigInt,
+          username: telegram_username,
+          firstName: telegram_first_name,
+          lastName: telegram_last_name,
+          bookmaker,
+          accountId: finalAccountId?.toString(),
+          amount: parseFloat(amount),
+          requestType: type,
+          bank,
+          phone,
+          status: 'pending',
+          photoFileUrl: receipt_photo || null, // Сохраняем base64 фото чека
+          idempotencyKey,
+        },
+      })
+    } catch (error: any) {
+      // Два одновременных запроса с одним ключом: второй упирается в уникальный индекс
+      if (idempotencyKey && error?.code === 'P2002') {
+        const existing = await prisma.request.findUnique({ where: { idempotencyKey } })
+        if (existing) {
+          return existingRequestResponse(existing.id)
+        }
+      }
+      throw error
+    }
 
     console.log('✅ Payment API - Request created successfully:', {
       id: newRequest.id,
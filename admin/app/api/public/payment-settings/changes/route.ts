@@ -0,0 +1,42 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { getPaymentSettings, waitForSettingsChange } from '@/lib/payment-settings'
+
+// Лента изменений настроек платежей (long-poll, без авторизации):
+// GET ?since=<версия>&wait=<секунды> отвечает сразу, если версия уже новее,
+// иначе ждет сохранения настроек не дольше wait секунд (по умолчанию 25)
+const MAX_WAIT_SECONDS = 55
+
+export async function OPTIONS() {
+  return new NextResponse(null, {
+    status: 200,
+    headers: {
+      'Access-Control-Allow-Origin': '*',
+      'Access-Control-Allow-Methods': 'GET, OPTIONS',
+      'Access-Control-Allow-Headers': 'Content-Type',
+    },
+  })
+}
+
+export async function GET(request: NextRequest) {
+  try {
+    const since = Number(request.nextUrl.searchParams.get('since')) || 0
+    const wait = Math.min(Number(request.nextUrl.searchParams.get('wait')) || 25, MAX_WAIT_SECONDS)
+
+    const version = await waitForSettingsChange(since, wait * 1000)
+    const body = version === since
+      ? { success: true, changed: false, version }
+      : { success: true, changed: true, version, settings: await getPaymentSettings() }
+
+    const res = NextResponse.json(body)
+    res.headers.set('Access-Control-Allow-Origin', '*')
+    res.headers.set('Cache-Control', 'no-store')
+    return res
+  } catch (error: any) {
+    console.error('Payment settings changes API error:', error)
+    const res = NextResponse.json({ success: false, error: error.message || 'Failed to wait for settings' }, { status: 500 })
+    res.headers.set('Access-Control-Allow-Origin', '*')
+    return res
+  }
+}
+
+export const dynamic = 'force-dynamic'
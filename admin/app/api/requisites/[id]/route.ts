@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { prisma } from '@/lib/prisma'
 import { requireAuth, createApiResponse } from '@/lib/api-helpers'
+import { bumpSettingsVersion } from '@/lib/payment-settings'
 
 export async function PATCH(
   request: NextRequest,
@@ -35,6 +36,9 @@ export async function PATCH(
       data: updateData,
     })
 
+    // Бот и сайт оплаты собирают QR по активному реквизиту - сообщаем им об изменении
+    await bumpSettingsVersion()
+
     return NextResponse.json(
       createApiResponse(requisite)
     )
@@ -59,6 +63,9 @@ export async function DELETE(
       where: { id },
     })
 
+    // Бот и сайт оплаты собирают QR по активному реквизиту - сообщаем им об изменении
+    await bumpSettingsVersion()
+
     return NextResponse.json(
       createApiResponse(null)
     )
@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { prisma } from '@/lib/prisma'
 import { requireAuth, createApiResponse } from '@/lib/api-helpers'
+import { bumpSettingsVersion } from '@/lib/payment-settings'
 
 export async function GET(request: NextRequest) {
   try {
@@ -54,6 +55,9 @@ export async function POST(request: NextRequest) {
       },
     })
 
+    // Бот и сайт оплаты собирают QR по активному реквизиту - сообщаем им об изменении
+    await bumpSettingsVersion()
+
     return NextResponse.json(
       createApiResponse(requisite)
     )
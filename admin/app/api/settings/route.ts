@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { prisma } from '@/lib/prisma'
 import { requireAuth, createApiResponse } from '@/lib/api-helpers'
+import { bumpSettingsVersion } from '@/lib/payment-settings'
 
 export async function GET(request: NextRequest) {
   try {
@@ -125,6 +126,9 @@ export async function POST(request: NextRequest) {
       }
     }
 
+    // Подписчики (бот, сайт оплаты) получат новые настройки сразу
+    await bumpSettingsVersion()
+
     return NextResponse.json(
       createApiResponse(null, undefined)
     )
@@ -9,6 +9,10 @@ interface Broadcast {
   sentAt: string | null
   createdAt: string
   sentCount?: number
+  isSent?: boolean
+  errorCount?: number
+  blockedCount?: number
+  totalUsers?: number
 }
 
 export default function BroadcastPage() {
@@ -186,7 +190,12 @@ export default function BroadcastPage() {
                       <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                         <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M17 20h5v-2a3 3 0 00-5.356-1.857M17 20H7m10 0v-2c0-.656-.126-1.283-.356-1.857M7 20H2v-2a3 3 0 015.356-1.857M7 20v-2c0-.656.126-1.283.356-1.857m0 0a5.002 5.002 0 019.288 0M15 7a3 3 0 11-6 0 3 3 0 016 0zm6 3a2 2 0 11-4 0 2 2 0 014 0zM7 10a2 2 0 11-4 0 2 2 0 014 0z" />
                       </svg>
-                      <span>{broadcast.sentCount || totalUsers} отправлено</span>
+                      <span>
+                        {broadcast.isSent === false
+                          ? `Отправляется: ${broadcast.sentCount || 0} из ${broadcast.totalUsers || totalUsers}`
+                          : `${broadcast.sentCount || totalUsers} отправлено`}
+                        {broadcast.blockedCount ? `, заблокировали: ${broadcast.blockedCount}` : ''}
+                      </span>
                     </div>
                     <div className="flex items-center space-x-1">
                       <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
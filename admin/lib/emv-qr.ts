@@ -0,0 +1,90 @@
+import { createHash } from 'crypto'
+
+// Сборка платежного QR (EMV/TLV). Тот же формат повторяют telegram_bot/emv_qr.py и
+// payment_site/emv_qr.py; при изменении перегенерируйте tests/fixtures/emv_qr_golden.json:
+//   npx tsx scripts/emv-qr-golden.ts > ../tests/fixtures/emv_qr_golden.json
+
+export const DEFAULT_ENABLED_BANKS = ['demirbank', 'omoney', 'balance', 'bakai', 'megapay', 'mbank']
+
+// id банка -> ключ в ссылках банков
+export const PRIMARY_BANK_MAP: Record<string, string> = {
+  'demirbank': 'DemirBank',
+  'omoney': 'O!Money',
+  'balance': 'Balance.kg',
+  'bakai': 'Bakai',
+  'megapay': 'MegaPay',
+  'mbank': 'MBank'
+}
+
+export function buildQrHash(requisite: string, amount: number): string {
+  // Конвертируем сумму в центы и форматируем
+  const amountCents = Math.round(amount * 100)
+  const amountStr = amountCents.toString().padStart(5, '0')
+  const amountLen = amountStr.length.toString().padStart(2, '0')
+
+  // Формируем TLV структуру
+  const requisiteLen = requisite.length.toString().padStart(2, '0')
+
+  const merchantAccountValue = (
+    `0015qr.demirbank.kg` +  // Под-тег 00: домен
+    `01047001` +              // Под-тег 01: короткий тип (7001)
+    `10${requisiteLen}${requisite}` +  // Под-тег 10: реквизит
+    `120211130212`            // Под-теги 12, 13: дополнительные поля
+  )
+  const merchantAccountLen = merchantAccountValue.length.toString().padStart(2, '0')
+
+  // Payload БЕЗ контрольной суммы и без 6304
+  const payload = (
+    `000201` +  // 00 - Payload Format Indicator
+    `010211` +  // 01 - Point of Initiation Method (статический QR)
+    `32${merchantAccountLen}${merchantAccountValue}` +  // 32 - Merchant Account
+    `52044829` +  // 52 - Merchant Category Code
+    `5303417` +   // 53 - Transaction Currency
+    `54${amountLen}${amountStr}` +  // 54 - Amount
+    `5909DEMIRBANK`  // 59 - Merchant Name
+  )
+
+  // Вычисляем SHA256 контрольную сумму от payload (БЕЗ 6304)
+  const checksumFull = createHash('sha256').update(payload).digest('hex')
+  // Берем последние 4 символа в нижнем регистре
+  const checksum = checksumFull.slice(-4).toLowerCase()
+
+  // Полный QR хеш: payload + '6304' + checksum
+  return payload + '6304' + checksum
+}
+
+// Ссылки на оплату во всех банках
+export function buildBankLinks(qrHash: string): Record<string, string> {
+  return {
+    'DemirBank': `https://retail.demirbank.kg/#${qrHash}`,
+    'O!Money': `https://api.dengi.o.kg/ru/qr/#${qrHash}`,
+    'Balance.kg': `https://balance.kg/#${qrHash}`,
+    'Bakai': `https://bakai24.app/#${qrHash}`,
+    'MegaPay': `https://megapay.kg/get#${qrHash}`,
+    'MBank': `https://app.mbank.kg/qr/#${qrHash}`,
+    // Также добавляем варианты с нижним регистром для совместимости
+    'demirbank': `https://retail.demirbank.kg/#${qrHash}`,
+    'omoney': `https://api.dengi.o.kg/ru/qr/#${qrHash}`,
+    'balance': `https://balance.kg/#${qrHash}`,
+    'bakai': `https://bakai24.app/#${qrHash}`,
+    'megapay': `https://megapay.kg/get#${qrHash}`,
+    'mbank': `https://app.mbank.kg/qr/#${qrHash}`
+  }
+}
+
+// Ответ POST /public/generate-qr
+export function buildQrResponse(requisite: string, amount: number, bank: string, enabledBanks: string[]) {
+  const qrHash = buildQrHash(requisite, amount)
+  const bankLinks = buildBankLinks(qrHash)
+  const primaryBank = PRIMARY_BANK_MAP[bank.toLowerCase()] || 'DemirBank'
+  return {
+    success: true,
+    qr_hash: qrHash,
+    primary_url: bankLinks[primaryBank] || bankLinks['DemirBank'],
+    all_bank_urls: bankLinks,
+    settings: {
+      enabled_banks: enabledBanks,
+      deposits_enabled: true
+    }
+  }
+}
@@ -0,0 +1,164 @@
+import { prisma } from '@/lib/prisma'
+
+// Номер версии настроек в BotConfiguration: растет при каждом сохранении настроек
+export const SETTINGS_VERSION_KEY = 'settings_version'
+
+// Как часто ожидающие изменений запросы сверяют версию с базой (другие экземпляры админки)
+const VERSION_CHECK_INTERVAL_MS = 1000
+
+const DEFAULT_DEPOSIT_BANKS = ['mbank', 'bakai', 'balance', 'demir', 'omoney', 'megapay']
+const DEFAULT_WITHDRAWAL_BANKS = ['kompanion', 'odengi', 'bakai', 'balance', 'megapay', 'mbank']
+const DEFAULT_CASINOS = {
+  '1xbet': true,
+  '1win': true,
+  melbet: true,
+  mostbet: true,
+  winwin: true,
+  '888starz': true,
+  '1xcasino': true,
+  betwinner: true
+}
+
+// Настройки по умолчанию (форма ответа; при недоступной базе не отдаются)
+export function defaultPaymentSettings() {
+  return {
+    success: true,
+    version: 0,
+    deposits: { enabled: true, banks: DEFAULT_DEPOSIT_BANKS },
+    withdrawals: { enabled: true, banks: DEFAULT_WITHDRAWAL_BANKS },
+    casinos: DEFAULT_CASINOS,
+    pause: false,
+    maintenance_message: 'Технические работы. Попробуйте позже.',
+    require_receipt_photo: false,
+    channel: '@bingokg_news',
+  }
+}
+
+export type PaymentSettings = ReturnType<typeof defaultPaymentSettings>
+
+export async function getSettingsVersion(): Promise<number> {
+  const row = await prisma.botConfiguration.findUnique({
+    where: { key: SETTINGS_VERSION_KEY },
+    select: { value: true },
+  })
+  return row ? Number(row.value) || 0 : 0
+}
+
+// Увеличить версию после сохранения настроек и разбудить ожидающих
+export async function bumpSettingsVersion(): Promise<number> {
+  const rows = await prisma.$queryRaw<{ value: string }[]>`
+    INSERT INTO bot_configuration (key, value, description, updated_at)
+    VALUES (${SETTINGS_VERSION_KEY}, '1', 'Версия настроек платежей', now())
+    ON CONFLICT (key) DO UPDATE
+    SET value = (bot_configuration.value::bigint + 1)::text, updated_at = now()
+    RETURNING value
+  `
+  const version = Number(rows[0].value)
+  notifyWaiters(version)
+  return version
+}
+
+async function buildPaymentSettings(version: number): Promise<PaymentSettings> {
+  const configs = await prisma.botConfiguration.findMany()
+  const settingsMap: Record<string, any> = {}
+
+  configs.forEach((config) => {
+    let value: any = config.value
+    // Пытаемся распарсить JSON, если это строка
+    if (typeof value === 'string') {
+      try {
+        value = JSON.parse(value)
+      } catch {
+        // Если не JSON, оставляем как строку
+      }
+    }
+    settingsMap[config.key] = value
+  })
+
+  const depositSettings = settingsMap.deposit_settings || settingsMap.deposits || {
+    enabled: true,
+    banks: DEFAULT_DEPOSIT_BANKS
+  }
+  const withdrawalSettings = settingsMap.withdrawal_settings || settingsMap.withdrawals || {
+    enabled: true,
+    banks: DEFAULT_WITHDRAWAL_BANKS
+  }
+  const casinoSettings = settingsMap.casinos || DEFAULT_CASINOS
+
+  // Формат, который ожидают бот и клиентский сайт
+  return {
+    success: true,
+    version,
+    deposits: typeof depositSettings === 'object' ? depositSettings : { enabled: depositSettings !== false, banks: [] },
+    withdrawals: typeof withdrawalSettings === 'object' ? withdrawalSettings : { enabled: withdrawalSettings !== false, banks: [] },
+    casinos: casinoSettings,
+    pause: settingsMap.pause === 'true' || settingsMap.pause === true,
+    maintenance_message: settingsMap.maintenance_message || 'Технические работы. Попробуйте позже.',
+    require_receipt_photo: settingsMap.require_receipt_photo === 'true' || settingsMap.require_receipt_photo === true,
+    channel: (typeof settingsMap.channel === 'string' ? settingsMap.channel : settingsMap.channel?.toString()) || '@bingokg_news',
+  }
+}
+
+// Собранные настройки последней версии: строки BotConfiguration перечитываются
+// только после смены версии, в остальных запросах - одна строка версии
+let snapshot: PaymentSettings | null = null
+
+export async function getPaymentSettings(): Promise<PaymentSettings> {
+  const version = await getSettingsVersion()
+  if (snapshot && snapshot.version === version) {
+    return snapshot
+  }
+  const settings = await buildPaymentSettings(version)
+  snapshot = settings
+  return settings
+}
+
+type Waiter = { since: number; resolve: (version: number) => void }
+
+const waiters = new Set<Waiter>()
+let versionTimer: ReturnType<typeof setInterval> | null = null
+
+function notifyWaiters(version: number) {
+  waiters.forEach((waiter) => {
+    if (version > waiter.since) {
+      waiters.delete(waiter)
+      waiter.resolve(version)
+    }
+  })
+  if (waiters.size === 0 && versionTimer) {
+    clearInterval(versionTimer)
+    versionTimer = null
+  }
+}
+
+// Дождаться версии новее since (не дольше timeoutMs); вернуть текущую версию.
+// Одна проверка базы в секунду на все ожидающие запросы процесса
+export async function waitForSettingsChange(since: number, timeoutMs: number): Promise<number> {
+  const current = await getSettingsVersion()
+  if (current !== since) {
+    return current
+  }
+
+  return new Promise((resolve) => {
+    const waiter: Waiter = {
+      since,
+      resolve: (version) => {
+        clearTimeout(timer)
+        resolve(version)
+      },
+    }
+    const timer = setTimeout(() => {
+      waiters.delete(waiter)
+      resolve(since)
+    }, timeoutMs)
+    waiters.add(waiter)
+
+    if (!versionTimer) {
+      versionTimer = setInterval(() => {
+        getSettingsVersion()
+          .then(notifyWaiters)
+          .catch((error) => console.error('Settings version check error:', error))
+      }, VERSION_CHECK_INTERVAL_MS)
+    }
+  })
+}
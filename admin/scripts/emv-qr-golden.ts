@@ -0,0 +1,37 @@
+/**
+ * Эталонные QR для проверки Python-копий (telegram_bot/emv_qr.py, payment_site/emv_qr.py)
+ * Использование: npx tsx scripts/emv-qr-golden.ts > ../tests/fixtures/emv_qr_golden.json
+ */
+
+import { buildQrResponse } from '../lib/emv-qr'
+
+const requisites = [
+  '1180000123456789',
+  '1030120000012345678901234567890123456789',
+  'Кошелёк №1',
+  'Ёлка-Ω 2025',
+  'wallet 🙂 ключ',
+]
+
+// Дробные тыйыны и суммы на границе округления Math.round
+const amounts = [1, 100, 150.37, 0.01, 0.005, 1.005, 2.675, 10.125, 0.1 + 0.2, 1234.5, 99999.99, 1234567.89]
+
+const banks = ['omoney', 'mbank', 'DEMIRBANK', 'unknown']
+
+const vectors = []
+let index = 0
+for (const requisite of requisites) {
+  for (const amount of amounts) {
+    const bank = banks[index++ % banks.length]
+    const enabledBanks = index % 2 ? ['omoney', 'mbank'] : ['demirbank', 'omoney', 'balance', 'bakai', 'megapay', 'mbank']
+    vectors.push({
+      requisite,
+      amount,
+      bank,
+      enabled_banks: enabledBanks,
+      response: buildQrResponse(requisite, amount, bank, enabledBanks),
+    })
+  }
+}
+
+console.log(JSON.stringify(vectors, null, 1))
@@ -1,19 +1,59 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_cors import CORS
+from quart import Quart, Response, render_template, request, jsonify, url_for
+from quart_cors import cors
 import aiohttp
 import asyncio
-import qrcode
-import io
-import base64
 import os
+import random
+import secrets
+import time
 import ssl
+import hashlib
+import json
+import sys
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from pathlib import Path
+from assets import AssetPipeline, ImageCache, PageTemplate
 
-app = Flask(__name__)
-CORS(app)
+# Сборка QR общая с ботом: модуль emv_qr.py лежит в telegram_bot
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'telegram_bot'))
+from emv_qr import amount_cents, build_qr_response
+from qr_render import QR_FORMATS, MAX_QR_DATA_LENGTH, QRRenderCache, decode_qr_key, encode_qr_key, qr_etag
+
+app = Quart(__name__)
+app = cors(app, allow_origin='*')
 
 API_BASE_URL = 'https://fqxgmrzplndwsyvkeu.ru/api'
 
+# Пул соединений к API админки (одна сессия на процесс)
+API_POOL_LIMIT = int(os.getenv('API_POOL_LIMIT', '200'))
+API_POOL_LIMIT_PER_HOST = int(os.getenv('API_POOL_LIMIT_PER_HOST', '100'))
+API_KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', '60'))
+API_DNS_CACHE_TTL = int(os.getenv('API_DNS_CACHE_TTL', '300'))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', '15'))
+
+# Кеш отрисованных QR (LRU) и число процессов для рендера (по умолчанию - по числу CPU)
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', '1024'))
+# Ключ подписи адресов /qr/...: без него выбирается случайный при старте
+# (адреса QR меняются после перезапуска и отличаются между процессами)
+QR_KEY_SECRET = os.getenv('QR_KEY_SECRET', '').encode() or secrets.token_bytes(32)
+QR_RENDER_WORKERS = int(os.getenv('QR_RENDER_WORKERS', '0')) or None
+qr_cache = QRRenderCache(max_items=QR_CACHE_SIZE, workers=QR_RENDER_WORKERS)
+
+# Время жизни кеша активного реквизита (QR собирается локально, см. emv_qr.py)
+REQUISITE_CACHE_TTL = float(os.getenv('REQUISITE_CACHE_TTL', '30'))
+requisite_cache = {'value': None, 'fetched_at': 0.0, 'task': None}
+NO_ACTIVE_REQUISITE_ERROR = 'No active wallet configured. Please select an active wallet in admin panel.'
+
+# Настройки платежей из ленты изменений админки (long-poll); changed - событие,
+# которое срабатывает при новой версии (ждут браузеры в /api/payment-settings/changes)
+SETTINGS_FEED_WAIT = float(os.getenv('SETTINGS_FEED_WAIT', '25'))
+settings_state = {'value': None, 'version': 0, 'changed': None, 'task': None}
+
+# Готовые ответы /api/bootstrap (LRU): ключ - сумма, реквизит и версия настроек
+BOOTSTRAP_CACHE_SIZE = int(os.getenv('BOOTSTRAP_CACHE_SIZE', '1024'))
+bootstrap_cache = OrderedDict()
+
 # Отключаем проверку SSL для внутренних запросов
 ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
@@ -29,6 +69,14 @@ if not os.path.exists(IMAGES_DIR):
     print(f"Warning: Images directory not found: {IMAGES_DIR}")
     IMAGES_DIR = None
 
+# Статика страницы оплаты (CSS/JS с отпечатком, сжатые при старте) и картинки банков в памяти
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+assets = AssetPipeline(ASSETS_DIR)
+bank_images = ImageCache(IMAGES_DIR)
+# Поля pay.html, которые меняются от запроса к запросу; остальное отрисовано при старте
+PAY_PAGE_FIELDS = ['amount', 'params_json']
+IMAGE_MAX_AGE = int(os.getenv('IMAGE_MAX_AGE', '86400'))
+
 # Банки для пополнения
 BANKS = [
     {'id': 'mbank', 'name': 'Mbank', 'icon': '/static/images/mbank.png'},
@@ -37,101 +85,231 @@ BANKS = [
     {'id': 'megapay', 'name': 'MEGApay', 'icon': '/static/images/megapay.jpg'},
 ]
 
-async def generate_qr_async(amount, bank):
-    """Асинхронная генерация QR кода"""
-    connector = aiohttp.TCPConnector(ssl=ssl_context)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.post(
-            f'{API_BASE_URL}/public/generate-qr',
-            json={'amount': amount, 'bank': bank}
-        ) as response:
-            return await response.json()
-
-def generate_qr_image(qr_hash):
-    """Генерация изображения QR кода"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+@app.before_serving
+async def open_api_session():
+    """Открыть общую сессию к API админки (keep-alive, пул соединений)"""
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=API_POOL_LIMIT,
+        limit_per_host=API_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=API_DNS_CACHE_TTL,
+    )
+    app.api_session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
     )
-    qr.add_data(qr_hash)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    return f'data:image/png;base64,{img_base64}'
+    qr_cache.start()
+    assets.build()
+    bank_images.load()
+    html = await render_template(
+        'pay.html',
+        asset_url=lambda filename: f'/assets/{assets.name(filename)}',
+        **PageTemplate.marks(PAY_PAGE_FIELDS),
+    )
+    app.pay_page = PageTemplate(html, PAY_PAGE_FIELDS)
+    settings_state['changed'] = asyncio.Event()
+    settings_state['task'] = asyncio.ensure_future(watch_settings())
+
+@app.after_serving
+async def close_api_session():
+    settings_state['task'].cancel()
+    await app.api_session.close()
+    qr_cache.shutdown()
+
+def update_settings(settings):
+    """Сохранить новые настройки и разбудить ожидающих изменений"""
+    settings_state['value'] = settings
+    settings_state['version'] = int(settings.get('version') or 0)
+    changed, settings_state['changed'] = settings_state['changed'], asyncio.Event()
+    changed.set()
+
+async def watch_settings():
+    """Подписка на изменения настроек в админке (переподключение с задержкой)"""
+    failures = 0
+    while True:
+        try:
+            async with app.api_session.get(
+                f'{API_BASE_URL}/public/payment-settings/changes',
+                params={'since': settings_state['version'], 'wait': int(SETTINGS_FEED_WAIT)},
+                timeout=aiohttp.ClientTimeout(total=SETTINGS_FEED_WAIT + API_TIMEOUT),
+            ) as response:
+                data = await response.json()
+            if not data.get('success'):
+                raise RuntimeError(data.get('error') or 'unsuccessful response')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failures += 1
+            delay = min(30, 2 ** failures) * random.uniform(0.5, 1.0)
+            print(f"Settings feed error: {e}; retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        failures = 0
+        if data.get('changed') and data.get('settings'):
+            update_settings(data['settings'])
+            invalidate_requisite()
+
+async def get_payment_settings():
+    """Настройки платежей: из подписки, до первого ответа - прямым запросом"""
+    if settings_state['value'] is None:
+        async with app.api_session.get(f'{API_BASE_URL}/public/payment-settings') as response:
+            data = await response.json()
+        if data.get('success') and settings_state['value'] is None:
+            update_settings(data)
+        return data
+    return settings_state['value']
+
+async def fetch_active_requisite():
+    """Активный реквизит из админки (None - активного реквизита нет).
+
+    Если запрос не удался - исключение: прежний реквизит остается в кеше.
+    """
+    async with app.api_session.get(f'{API_BASE_URL}/public/requisites/list') as response:
+        data = await response.json()
+    if not data.get('success'):
+        raise RuntimeError(data.get('error') or 'unsuccessful response')
+    for requisite in data.get('requisites', []):
+        if requisite.get('id') == data.get('active_id'):
+            return requisite.get('value')
+    return None
+
+async def refresh_requisite():
+    try:
+        value = await fetch_active_requisite()
+    except Exception as e:
+        print(f"Error fetching active requisite: {e}")
+        return requisite_cache['value']
+    requisite_cache['value'] = value
+    requisite_cache['fetched_at'] = time.monotonic()
+    return value
+
+def invalidate_requisite():
+    """Перечитать реквизит сейчас (админка повышает версию настроек при его смене)"""
+    requisite_cache['fetched_at'] = 0.0
+    task = requisite_cache['task']
+    if task is None or task.done():
+        requisite_cache['task'] = asyncio.ensure_future(refresh_requisite())
+
+async def get_active_requisite():
+    """Активный реквизит из кеша; устаревшее значение обновляется одним фоновым запросом"""
+    task = requisite_cache['task']
+    if task is None or task.done():
+        if time.monotonic() - requisite_cache['fetched_at'] < REQUISITE_CACHE_TTL:
+            return requisite_cache['value']
+        task = requisite_cache['task'] = asyncio.ensure_future(refresh_requisite())
+    if requisite_cache['value'] is not None:
+        return requisite_cache['value']
+    return await asyncio.shield(task)
+
+async def generate_qr_async(amount, bank, enabled_banks=None):
+    """Генерация QR кода: локально по активному реквизиту, иначе через API админки"""
+    requisite = await get_active_requisite()
+    if requisite is None and requisite_cache['fetched_at']:
+        # Админка ответила, что активного реквизита нет - та же ошибка, что у нее
+        return {'success': False, 'error': NO_ACTIVE_REQUISITE_ERROR}
+    if requisite and amount > 0:
+        return build_qr_response(requisite, amount, bank, enabled_banks)
+
+    async with app.api_session.post(
+        f'{API_BASE_URL}/public/generate-qr',
+        json={'amount': amount, 'bank': bank}
+    ) as response:
+        return await response.json()
+
+# Размер модуля QR в пикселях для PNG
+QR_BOX_SIZE = 10
+
+def qr_image_url(data, fmt='png'):
+    """Адрес изображения QR (/qr/<key>.<ext>), его можно кешировать в браузере"""
+    return url_for('qr_image', key=encode_qr_key(data, QR_KEY_SECRET), ext=fmt)
+
+def qr_image_urls(qr_data):
+    """Адреса изображений QR, который показывает pay.html: ссылка O!Money
+    (как и раньше в браузере), а не сам qr_hash. Без ссылки - None"""
+    bank_urls = qr_data.get('all_bank_urls') or {}
+    link = bank_urls.get('omoney') or bank_urls.get('O!Money') or qr_data.get('primary_url')
+    if not link:
+        return None, None
+    return qr_image_url(link), qr_image_url(link, 'svg')
 
 @app.route('/')
-def index():
-    return render_template('index.html')
+async def index():
+    return await render_template('index.html')
 
-@app.route('/static/images/<path:filename>')
-def images(filename):
-    """Отдача изображений банков"""
-    if not IMAGES_DIR or not os.path.exists(IMAGES_DIR):
+def cached_response(item, cache_control):
+    """Ответ из памяти с ETag (304, если у браузера та же версия)"""
+    headers = {'ETag': item.etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if item.etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    body, encoding = item.body(request.headers.get('Accept-Encoding', ''))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, content_type=item.content_type, headers=headers)
+
+@app.route('/assets/<name>')
+async def asset(name):
+    """CSS/JS страницы оплаты: имя с отпечатком содержимого, кеш навсегда"""
+    item = assets.get(name)
+    if item is None:
         return '', 404
-    try:
-        return send_from_directory(IMAGES_DIR, filename)
-    except:
-        # Если файл не найден, возвращаем пустой ответ
+    return cached_response(item, 'public, max-age=31536000, immutable')
+
+@app.route('/static/images/<path:filename>')
+async def images(filename):
+    """Отдача изображений банков (из памяти)"""
+    image = bank_images.get(filename)
+    if image is None:
         return '', 404
+    return cached_response(image, f'public, max-age={IMAGE_MAX_AGE}')
 
 @app.route('/pay')
-def pay():
+async def pay():
     amount = request.args.get('amount', '0')
-    qr_hash = request.args.get('qr', '')
-    request_id = request.args.get('request_id', '')
-    # Новые параметры для создания заявки
-    user_id = request.args.get('user_id', '')
-    casino_id = request.args.get('casino_id', '')
-    account_id = request.args.get('account_id', '')
-    username = request.args.get('username', '')
-    first_name = request.args.get('first_name', '')
-    last_name = request.args.get('last_name', '')
-    
-    # Вычисляем время окончания (5 минут)
-    expires_at = datetime.now() + timedelta(minutes=5)
-    expires_timestamp = int(expires_at.timestamp() * 1000)
-    
-    return render_template('pay.html', 
-                         amount=amount,
-                         qr_hash=qr_hash,
-                         request_id=request_id,
-                         user_id=user_id,
-                         casino_id=casino_id,
-                         account_id=account_id,
-                         username=username,
-                         first_name=first_name,
-                         last_name=last_name,
-                         banks=BANKS,
-                         expires_timestamp=expires_timestamp)
+
+    # Время окончания: срок резерва суммы из ссылки бота (unix, секунды),
+    # без него - 5 минут от открытия страницы, как раньше
+    expires = request.args.get('expires', type=int)
+    if expires:
+        expires_timestamp = expires * 1000
+    else:
+        expires_at = datetime.now() + timedelta(minutes=5)
+        expires_timestamp = int(expires_at.timestamp() * 1000)
+
+    params = {
+        'amount': amount,
+        'qr_hash': request.args.get('qr', ''),
+        'request_id': request.args.get('request_id', ''),
+        # Новые параметры для создания заявки
+        'user_id': request.args.get('user_id', ''),
+        'casino_id': request.args.get('casino_id', ''),
+        'account_id': request.args.get('account_id', ''),
+        'username': request.args.get('username', ''),
+        'first_name': request.args.get('first_name', ''),
+        'last_name': request.args.get('last_name', ''),
+        'expires_timestamp': expires_timestamp,
+    }
+    html = app.pay_page.render(html={'amount': amount}, json={'params_json': params})
+    return Response(html, content_type='text/html; charset=utf-8')
 
 @app.route('/api/generate-qr', methods=['POST'])
-def generate_qr():
+async def generate_qr():
     try:
-        data = request.json
+        data = await request.get_json()
         amount = float(data.get('amount', 0))
         bank = data.get('bank', 'omoney')  # По умолчанию O!Money
-        
-        # Асинхронный вызов
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        qr_data = loop.run_until_complete(generate_qr_async(amount, bank))
-        loop.close()
-        
+
+        qr_data = await generate_qr_async(amount, bank)
+
         if qr_data.get('success'):
-            qr_hash = qr_data.get('qr_hash')
-            qr_image = generate_qr_image(qr_hash)
-            
+            qr_url, qr_svg_url = qr_image_urls(qr_data)
+
             return jsonify({
                 'success': True,
-                'qr_hash': qr_hash,
-                'qr_image': qr_image,
+                'qr_hash': qr_data.get('qr_hash'),
+                'qr_url': qr_url,
+                'qr_svg_url': qr_svg_url,
+                'primary_url': qr_data.get('primary_url'),
                 'all_bank_urls': qr_data.get('all_bank_urls', {}),
                 'bank_urls': qr_data.get('all_bank_urls', {})  # Для совместимости
             })
@@ -140,15 +318,122 @@ def generate_qr():
                 'success': False,
                 'error': qr_data.get('error', 'Failed to generate QR')
             }), 400
-            
+
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/qr/<key>.<ext>')
+async def qr_image(key, ext):
+    """Изображение QR по подписанному адресу (PNG или SVG, неизменяемое); чужие данные - 404"""
+    data = decode_qr_key(key, QR_KEY_SECRET)
+    if ext not in QR_FORMATS or not data or len(data) > MAX_QR_DATA_LENGTH:
+        return '', 404
+
+    etag = qr_etag(data, QR_BOX_SIZE, ext)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable',
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+
+    image = await qr_cache.get(data, box_size=QR_BOX_SIZE, fmt=ext)
+    return Response(image, content_type=QR_FORMATS[ext], headers=headers)
+
+async def build_bootstrap(amount):
+    """Все данные для первой отрисовки pay.html: настройки, QR и ссылки банков.
+
+    Возвращает (тело ответа в JSON, ETag). Ответ кешируется, пока не изменились
+    сумма, активный реквизит или версия настроек.
+    """
+    try:
+        settings = await get_payment_settings()
+    except Exception as e:
+        print(f"Error loading payment settings: {e}")
+        settings = {}
+    requisite = await get_active_requisite()
+    key = (amount_cents(amount), requisite, settings.get('version'))
+    cached = bootstrap_cache.get(key)
+    if cached is not None:
+        bootstrap_cache.move_to_end(key)
+        return cached
+
+    enabled_banks = (settings.get('deposits') or {}).get('banks') or None
+    qr_data = await generate_qr_async(amount, 'omoney', enabled_banks)
+    if not qr_data.get('success'):
+        raise ValueError(qr_data.get('error', 'Failed to generate QR'))
+
+    qr_url, qr_svg_url = qr_image_urls(qr_data)
+    body = json.dumps({
+        'success': True,
+        'settings': settings,
+        'qr_hash': qr_data.get('qr_hash'),
+        'qr_url': qr_url,
+        'qr_svg_url': qr_svg_url,
+        'primary_url': qr_data.get('primary_url'),
+        'all_bank_urls': qr_data.get('all_bank_urls', {}),
+    }, ensure_ascii=False)
+    etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+
+    # Без настроек или реквизита (админка недоступна) не кешируем
+    if settings.get('success') and requisite:
+        bootstrap_cache[key] = (body, etag)
+        if len(bootstrap_cache) > BOOTSTRAP_CACHE_SIZE:
+            bootstrap_cache.popitem(last=False)
+    return body, etag
+
+@app.route('/api/bootstrap')
+async def bootstrap():
+    """Данные для первой отрисовки pay.html одним запросом"""
+    amount = request.args.get('amount', 0, type=float)
+    try:
+        body, etag = await build_bootstrap(amount)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+    # Реквизит и настройки могут поменяться - браузер переспрашивает, но получает 304
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    return Response(body, content_type='application/json', headers=headers)
+
+@app.route('/api/payment-settings')
+async def payment_settings():
+    """Настройки платежей для pay.html (из памяти, без запроса к админке)"""
+    try:
+        return jsonify(await get_payment_settings())
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+@app.route('/api/payment-settings/changes')
+async def payment_settings_changes():
+    """Long-poll для pay.html: ответ, как только версия настроек станет новее since"""
+    since = request.args.get('since', 0, type=int)
+    wait = min(request.args.get('wait', SETTINGS_FEED_WAIT, type=float), 55)
+    if settings_state['version'] == since:
+        try:
+            await asyncio.wait_for(settings_state['changed'].wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+    if settings_state['version'] == since or settings_state['value'] is None:
+        return jsonify({'success': True, 'changed': False, 'version': since})
+    return jsonify({
+        'success': True,
+        'changed': True,
+        'version': settings_state['version'],
+        'settings': settings_state['value'],
+    })
+
+@app.route('/api/qr-cache-stats')
+async def qr_cache_stats():
+    """Статистика кеша изображений QR"""
+    return jsonify(qr_cache.stats())
+
 if __name__ == '__main__':
+    # Для продакшна: hypercorn app:app --bind 0.0.0.0:3003
     port = int(os.getenv('PORT', 3003))
     debug = os.getenv('FLASK_ENV') != 'production'
     app.run(host='0.0.0.0', port=port, debug=debug)
-
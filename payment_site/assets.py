@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, List, Optional, Tuple
+
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import escape
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаем gzip
+    brotli = None
+
+# Метка поля в заранее отрисованном шаблоне (в HTML такой символ не встречается)
+_MARK = '\x00'
+
+
+class Asset:
+    __slots__ = ('name', 'content_type', 'etag', 'bodies')
+
+    def __init__(self, name: str, data: bytes, content_type: str):
+        self.name = name
+        self.content_type = content_type
+        self.etag = '"%s"' % hashlib.sha256(data).hexdigest()[:32]
+        # Варианты тела по Content-Encoding (None - без сжатия)
+        self.bodies: Dict[Optional[str], bytes] = {None: data}
+
+    def compress(self) -> None:
+        self.bodies['gzip'] = gzip.compress(self.bodies[None], compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(self.bodies[None], quality=11)
+
+    def body(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Самый компактный вариант, который принимает браузер"""
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.bodies:
+                return self.bodies[encoding], encoding
+        return self.bodies[None], None
+
+
+class AssetPipeline:
+    """Статические CSS/JS, собранные при старте.
+
+    Каждый файл из source_dir получает имя с отпечатком содержимого
+    (pay.css -> pay.3f2a9c1b7d4e.css) и заранее сжимается gzip и brotli.
+    Адрес меняется вместе с содержимым, поэтому ответы кешируются навсегда.
+    """
+
+    def __init__(self, source_dir: str):
+        self.source_dir = source_dir
+        self._urls: Dict[str, str] = {}
+        self._assets: Dict[str, Asset] = {}
+
+    def build(self) -> None:
+        urls, assets = {}, {}
+        for filename in sorted(os.listdir(self.source_dir)):
+            path = os.path.join(self.source_dir, filename)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(filename)
+            name = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type.endswith('javascript'):
+                content_type += '; charset=utf-8'
+            asset = Asset(name, data, content_type)
+            asset.compress()
+            urls[filename] = name
+            assets[name] = asset
+        self._urls, self._assets = urls, assets
+
+    def name(self, filename: str) -> str:
+        """Имя файла с отпечатком (pay.css -> pay.<hash>.css)"""
+        return self._urls[filename]
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self._assets.get(name)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {encoding or 'identity': len(body) for encoding, body in asset.bodies.items()}
+            for name, asset in self._assets.items()
+        }
+
+
+class ImageCache:
+    """Изображения банков в памяти (читаются с диска один раз) с ETag"""
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        self._images: Dict[str, Asset] = {}
+
+    def load(self) -> None:
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                self._read(os.path.relpath(path, self.directory).replace(os.sep, '/'))
+
+    def _read(self, filename: str) -> Optional[Asset]:
+        path = safe_join(self.directory, filename)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        image = self._images[filename] = Asset(filename, data, content_type)
+        return image
+
+    def get(self, filename: str) -> Optional[Asset]:
+        image = self._images.get(filename)
+        if image is None and self.directory:
+            # Файл мог появиться после старта
+            image = self._read(filename)
+        return image
+
+
+class PageTemplate:
+    """Страница, отрисованная при старте; на запрос подставляются только поля.
+
+    Шаблон рендерится один раз с метками вместо полей (fields) и режется по ним,
+    render() склеивает готовые куски с экранированными значениями.
+    """
+
+    def __init__(self, html: str, fields: List[str]):
+        self._parts: List[str] = []
+        self._fields: List[str] = []
+        rest = html
+        while _MARK in rest:
+            before, field, rest = rest.split(_MARK, 2)
+            if field not in fields:
+                raise ValueError(f'Unknown template field: {field}')
+            self._parts.append(before)
+            self._fields.append(field)
+        self._parts.append(rest)
+
+    @staticmethod
+    def marks(fields: List[str]) -> Dict[str, str]:
+        """Значения для рендера шаблона при старте"""
+        return {field: f'{_MARK}{field}{_MARK}' for field in fields}
+
+    def render(self, html: Dict[str, str], json: Dict[str, object]) -> str:
+        """html - поля в разметке (экранируются), json - поля внутри <script>"""
+        values = {key: str(escape(value)) for key, value in html.items()}
+        values.update({key: str(htmlsafe_json_dumps(value)) for key, value in json.items()})
+        chunks = [self._parts[0]]
+        for field, part in zip(self._fields, self._parts[1:]):
+            chunks.append(values[field])
+            chunks.append(part)
+        return ''.join(chunks)
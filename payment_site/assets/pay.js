@@ -0,0 +1,777 @@
+// Инициализация Telegram WebApp
+let tg = window.Telegram?.WebApp;
+
+// Проверка, открыто ли приложение в Telegram
+if (!tg || !tg.initDataUnsafe?.user) {
+    // Если открыто не в Telegram, показываем предупреждение
+    document.body.innerHTML = `
+        <div style="
+            background: var(--tg-theme-bg-color, #ffffff);
+            color: var(--tg-theme-text-color, #000000);
+            padding: 40px 20px;
+            height: 100vh;
+            width: 100vw;
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            justify-content: center;
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            text-align: center;
+        ">
+            <img src="https://telegram.org/img/t_logo.png" alt="Telegram" style="width: 120px; height: 120px; margin-bottom: 20px;">
+            <p style="font-size: 18px; margin: 8px 0;"><strong>Упс!</strong></p>
+            <p style="font-size: 18px; margin: 8px 0;">Это приложение должно быть запущено <strong>внутри Telegram!</strong></p>
+        </div>
+    `;
+} else {
+    // Если открыто в Telegram, инициализируем приложение
+    tg.expand(); // Расширяем на все окно
+    tg.ready(); // Говорим Telegram, что приложение готово
+}
+
+// Получаем ID пользователя из Telegram WebApp
+function getUserId() {
+    // Основной способ: initDataUnsafe.user.id
+    if (tg?.initDataUnsafe?.user?.id) {
+        const userId = tg.initDataUnsafe.user.id.toString();
+        console.log('✅ Got user ID from initDataUnsafe.user.id:', userId);
+        return userId;
+    }
+    
+    // Fallback: пытаемся получить из URL параметров (если передано)
+    const urlParams = new URLSearchParams(window.location.search);
+    const userIdFromUrl = urlParams.get('user_id');
+    if (userIdFromUrl) {
+        console.log('✅ Got user ID from URL parameter:', userIdFromUrl);
+        return userIdFromUrl;
+    }
+    
+    console.warn('⚠️ Could not get user ID from Telegram WebApp');
+    return null;
+}
+
+// Глобальные переменные
+let amount, requestId, expiresAt, telegramUserId, bankUrls, selectedBank, receiptFile;
+let casinoId, accountId, username, firstName, lastName;
+let paymentSettings = null;
+let requireReceiptPhoto = true; // По умолчанию требуется
+
+// Инициализация данных (всегда, независимо от Telegram)
+// Поля запроса подставляет сервер в window.PAY_PARAMS, остальной код - статический файл
+const payParams = window.PAY_PARAMS || {};
+amount = parseFloat(payParams.amount) || 0;
+// Обрабатываем request_id: если пустой или 'None', устанавливаем в пустую строку
+const requestIdRaw = String(payParams.request_id || '').trim();
+requestId = (requestIdRaw && requestIdRaw !== 'None' && requestIdRaw !== 'null' && requestIdRaw !== 'undefined') ? requestIdRaw : '';
+expiresAt = parseInt(payParams.expires_timestamp) || (Date.now() + 300000);
+telegramUserId = getUserId() || payParams.user_id || '';
+casinoId = payParams.casino_id || '';
+accountId = payParams.account_id || '';
+username = payParams.username || '';
+firstName = payParams.first_name || '';
+lastName = payParams.last_name || '';
+bankUrls = {};
+selectedBank = 'omoney';
+receiptFile = null;
+
+// Все возможные банки (будут отфильтрованы по настройкам)
+const allBanks = [
+    { id: 'omoney', name: 'O!Money' },
+    { id: 'mbank', name: 'MBank' },
+    { id: 'bakai', name: 'Bakai' },
+    { id: 'demir', name: 'DemirBank' },
+    { id: 'demirbank', name: 'DemirBank' }, // Альтернативное название
+    { id: 'balance', name: 'Balance.kg' },
+    { id: 'megapay', name: 'MegaPay' }
+];
+
+// Банки (будут обновлены после загрузки настроек)
+let banks = [...allBanks];
+
+// Загрузка настроек (сайт оплаты держит их в памяти по подписке на админку)
+async function loadPaymentSettings() {
+    try {
+        const response = await fetch('/api/payment-settings');
+        const data = await response.json();
+        applyPaymentSettings(data);
+    } catch (error) {
+        console.error('❌ Error loading payment settings:', error);
+        // Используем настройки по умолчанию
+    }
+}
+
+// Ожидание изменений настроек в админке (long-poll) и применение без перезагрузки
+async function watchPaymentSettings() {
+    while (true) {
+        try {
+            const since = paymentSettings?.version || 0;
+            const response = await fetch(`/api/payment-settings/changes?since=${since}`);
+            const data = await response.json();
+            if (data.success && data.changed && data.settings) {
+                applyPaymentSettings(data.settings);
+                setupBankButtons();
+            } else if (!data.success) {
+                await new Promise(resolve => setTimeout(resolve, 10000));
+            }
+        } catch (error) {
+            await new Promise(resolve => setTimeout(resolve, 10000));
+        }
+    }
+}
+
+function applyPaymentSettings(data) {
+    if (data.success) {
+        paymentSettings = data;
+        
+        // Обновляем требование фото чека
+        requireReceiptPhoto = data.require_receipt_photo !== false;
+        
+        // Обновляем видимость блока с чеком
+        const receiptBlock = document.querySelector('.receipt-upload');
+        const receiptRequired = document.getElementById('receiptRequired');
+        const receiptHint = document.getElementById('receiptHint');
+        
+        if (receiptBlock) {
+            if (!requireReceiptPhoto) {
+                receiptBlock.style.display = 'none';
+            } else {
+                receiptBlock.style.display = 'block';
+            }
+        }
+        
+        if (receiptRequired) {
+            receiptRequired.style.display = requireReceiptPhoto ? 'inline' : 'none';
+        }
+        
+        if (receiptHint) {
+            receiptHint.textContent = requireReceiptPhoto 
+                ? 'JPG, PNG до 5MB. Обязательно для подтверждения оплаты'
+                : 'JPG, PNG до 5MB. Необязательно, но рекомендуется';
+        }
+        
+        // Фильтруем банки по настройкам
+        const enabledBanks = data.deposits?.banks || [];
+        if (enabledBanks.length > 0) {
+            banks = allBanks.filter(bank => {
+                // Проверяем по id и альтернативным названиям
+                return enabledBanks.includes(bank.id) || 
+                       (bank.id === 'demirbank' && enabledBanks.includes('demir')) ||
+                       (bank.id === 'demir' && enabledBanks.includes('demirbank'));
+            });
+            
+            // Убираем дубликаты (demir и demirbank)
+            const seen = new Set();
+            banks = banks.filter(bank => {
+                const key = bank.id === 'demir' || bank.id === 'demirbank' ? 'demir' : bank.id;
+                if (seen.has(key)) return false;
+                seen.add(key);
+                return true;
+            });
+            
+            // Если выбранный банк не в списке, выбираем первый доступный
+            if (!banks.find(b => b.id === selectedBank || (b.id === 'demir' && selectedBank === 'demirbank') || (b.id === 'demirbank' && selectedBank === 'demir'))) {
+                selectedBank = banks[0]?.id || 'omoney';
+            }
+        }
+        
+        console.log('✅ Payment settings loaded:', {
+            version: data.version,
+            requireReceiptPhoto: requireReceiptPhoto,
+            enabledBanks: enabledBanks,
+            filteredBanks: banks.map(b => b.id)
+        });
+    }
+}
+
+console.log('📊 Payment Form Data:', {
+    telegramUserId: telegramUserId,
+    requestId: requestId,
+    amount: amount,
+    expiresAt: expiresAt,
+    casinoId: casinoId,
+    accountId: accountId,
+    tgAvailable: !!tg,
+    userAvailable: !!tg?.initDataUnsafe?.user
+});
+
+// Таймер обратного отсчета (глобальная функция)
+function updateTimer() {
+    const now = Date.now();
+    const remaining = expiresAt - now;
+    
+    if (remaining <= 0) {
+        const timerEl = document.getElementById('timer');
+        if (timerEl) {
+            timerEl.textContent = '00:00';
+            timerEl.style.color = '#e74c3c';
+        }
+        // Таймер истек - закрываем форму и возвращаем в главное меню
+        if (tg) {
+            tg.showPopup({
+                title: '⏰ Время истекло',
+                message: 'Время на оплату истекло. Форма будет закрыта.',
+                buttons: [{ 
+                    type: 'ok',
+                    text: 'ОК'
+                }]
+            });
+            setTimeout(() => {
+                tg.close();
+            }, 2000);
+        }
+        return;
+    }
+    
+    const minutes = Math.floor(remaining / 60000);
+    const seconds = Math.floor((remaining % 60000) / 1000);
+    
+    const timerEl = document.getElementById('timer');
+    if (timerEl) {
+        timerEl.textContent = 
+            `${String(minutes).padStart(2, '0')}:${String(seconds).padStart(2, '0')}`;
+    }
+}
+
+// Запускаем таймер
+setInterval(updateTimer, 1000);
+updateTimer();
+
+// Генерация QR кода (глобальная функция)
+async function loadQR() {
+    try {
+        console.log('📤 Loading QR code for amount:', amount);
+        
+        // QR собирает наш сервер (локально или через админку)
+        let response;
+        try {
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 30000);
+            
+            response = await fetch('/api/generate-qr', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    amount: amount,
+                    bank: 'omoney' // По умолчанию O!Money
+                }),
+                signal: controller.signal
+            });
+            
+            clearTimeout(timeoutId);
+        } catch (fetchError) {
+            console.error('❌ Fetch error loading QR:', fetchError);
+            if (fetchError.name === 'AbortError') {
+                throw new Error('Превышено время ожидания ответа от сервера');
+            } else {
+                throw new Error('Не удалось подключиться к серверу: ' + fetchError.message);
+            }
+        }
+        
+        if (!response.ok && response.status !== 400) {
+            const errorText = await response.text();
+            console.error('❌ Response error loading QR:', response.status, errorText);
+            throw new Error(`Ошибка сервера (${response.status}): ${errorText.substring(0, 100)}`);
+        }
+        
+        let data;
+        try {
+            data = await response.json();
+        } catch (jsonError) {
+            console.error('❌ JSON parse error loading QR:', jsonError);
+            const text = await response.text();
+            throw new Error(`Неверный ответ от сервера: ${text.substring(0, 100)}`);
+        }
+        
+        console.log('✅ QR data received:', { success: data.success, has_urls: !!data.all_bank_urls });
+        
+        if (data.success) {
+            bankUrls = data.all_bank_urls || {};
+            
+            // Изображение QR из ссылки O!Money (адрес собирает сервер)
+            if (data.qr_svg_url) {
+                generateQRImage(data.qr_svg_url);
+            } else {
+                console.error('❌ O!Money URL not found in response:', bankUrls);
+                document.getElementById('qrContainer').innerHTML = 
+                    `<div class="loading" style="color: #e74c3c;">Ошибка: Ссылка O!Money не найдена</div>`;
+            }
+            
+            // Настраиваем кнопки банков
+            setupBankButtons();
+        } else {
+            console.error('❌ QR generation failed:', data.error);
+            document.getElementById('qrContainer').innerHTML = 
+                `<div class="loading" style="color: #e74c3c;">Ошибка: ${data.error || 'Не удалось сгенерировать QR код'}</div>`;
+        }
+    } catch (error) {
+        console.error('❌ Error loading QR:', error);
+        console.error('❌ Error details:', {
+            name: error.name,
+            message: error.message,
+            stack: error.stack
+        });
+        document.getElementById('qrContainer').innerHTML = 
+            `<div class="loading" style="color: #e74c3c;">Ошибка загрузки QR кода: ${error.message || 'Неизвестная ошибка'}</div>`;
+    }
+}
+
+// Первая отрисовка одним запросом: настройки, QR и ссылки банков
+async function loadBootstrap() {
+    const response = await fetch(`/api/bootstrap?amount=${encodeURIComponent(amount)}`);
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error || 'Не удалось загрузить данные оплаты');
+    }
+    
+    applyPaymentSettings(data.settings || {});
+    bankUrls = data.all_bank_urls || {};
+    if (data.qr_svg_url) {
+        generateQRImage(data.qr_svg_url);
+    }
+    setupBankButtons();
+}
+
+// Показать QR: изображение по адресу /qr/<данные>.svg с нашего сервера
+// (одинаковая ссылка дает одинаковый адрес, браузер берет картинку из кеша)
+function generateQRImage(imageUrl) {
+    const qrContainer = document.getElementById('qrContainer');
+    if (!qrContainer) return;
+    
+    qrContainer.innerHTML = `
+        <div class="qr-code">
+            <img src="${imageUrl}" width="220" height="220" alt="QR Code">
+        </div>
+        <p style="margin-top: 12px; color: #666; font-size: 13px;">Отсканируйте QR код для оплаты</p>
+    `;
+}
+
+// Настройка кнопок банков (глобальная функция)
+function setupBankButtons() {
+    const bankButtonsContainer = document.getElementById('bankButtons');
+    if (!bankButtonsContainer) {
+        console.warn('bankButtons container not found');
+        return;
+    }
+    
+    bankButtonsContainer.innerHTML = '';
+    
+    banks.forEach(bank => {
+        const bankUrl = bankUrls[bank.id] || bankUrls[bank.name];
+        const button = document.createElement('a');
+        button.href = bankUrl || '#';
+        button.target = '_blank';
+        button.className = 'bank-button';
+        if (bank.id === selectedBank) {
+            button.classList.add('active');
+        }
+        button.textContent = bank.name;
+        
+        if (bankUrl) {
+            button.onclick = (e) => {
+                e.preventDefault();
+                selectedBank = bank.id;
+                // Обновляем активную кнопку
+                document.querySelectorAll('.bank-button').forEach(btn => {
+                    btn.classList.remove('active');
+                });
+                button.classList.add('active');
+                // Открываем ссылку
+                window.open(bankUrl, '_blank');
+            };
+        } else {
+            // Если URL еще не загружен, делаем кнопку неактивной
+            button.style.opacity = '0.5';
+            button.style.cursor = 'wait';
+            button.onclick = (e) => {
+                e.preventDefault();
+            };
+        }
+        
+        bankButtonsContainer.appendChild(button);
+    });
+}
+
+// Инициализация загрузки фото чека (глобальная функция)
+function initReceiptUpload() {
+    const uploadArea = document.getElementById('uploadArea');
+    const fileInput = document.getElementById('fileInput');
+    const receiptPreview = document.getElementById('receiptPreview');
+    const receiptImage = document.getElementById('receiptImage');
+    
+    if (!uploadArea || !fileInput) return;
+    
+    uploadArea.addEventListener('click', () => fileInput.click());
+    
+    uploadArea.addEventListener('dragover', (e) => {
+        e.preventDefault();
+        uploadArea.classList.add('dragover');
+    });
+    
+    uploadArea.addEventListener('dragleave', () => {
+        uploadArea.classList.remove('dragover');
+    });
+    
+    uploadArea.addEventListener('drop', (e) => {
+        e.preventDefault();
+        uploadArea.classList.remove('dragover');
+        const files = e.dataTransfer.files;
+        if (files.length > 0) {
+            handleFile(files[0]);
+        }
+    });
+    
+    fileInput.addEventListener('change', (e) => {
+        if (e.target.files.length > 0) {
+            handleFile(e.target.files[0]);
+        }
+    });
+}
+
+// Обработка файла (глобальная функция)
+function handleFile(file) {
+    if (!file.type.startsWith('image/')) {
+        if (tg) {
+            tg.showPopup({
+                title: 'Ошибка',
+                message: 'Пожалуйста, выберите изображение',
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Пожалуйста, выберите изображение');
+        }
+        return;
+    }
+    
+    if (file.size > 5 * 1024 * 1024) {
+        if (tg) {
+            tg.showPopup({
+                title: 'Ошибка',
+                message: 'Файл слишком большой. Максимум 5MB',
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Файл слишком большой. Максимум 5MB');
+        }
+        return;
+    }
+    
+    receiptFile = file;
+    const reader = new FileReader();
+    reader.onload = (e) => {
+        receiptImage.src = e.target.result;
+        receiptPreview.classList.add('show');
+    };
+    reader.readAsDataURL(file);
+}
+
+// Удаление чека (глобальная функция)
+window.removeReceipt = function() {
+    receiptFile = null;
+    const receiptImage = document.getElementById('receiptImage');
+    const receiptPreview = document.getElementById('receiptPreview');
+    const fileInput = document.getElementById('fileInput');
+    
+    if (receiptImage) receiptImage.src = '';
+    if (receiptPreview) receiptPreview.classList.remove('show');
+    if (fileInput) fileInput.value = '';
+};
+
+// Отправка заявки с чеком при нажатии "Я оплатил" (глобальная функция)
+window.submitPayment = async function() {
+    // Проверяем, что открыто в Telegram
+    if (!tg || !tg.initDataUnsafe?.user) {
+        if (tg) {
+            tg.showPopup({
+                title: 'Ошибка',
+                message: 'Приложение должно быть открыто в Telegram',
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Приложение должно быть открыто в Telegram');
+        }
+        return;
+    }
+    
+    const paidButton = document.getElementById('paidButton');
+    
+    // Проверяем наличие обязательных данных для создания заявки
+    if (!telegramUserId || !casinoId || !accountId) {
+        if (tg) {
+            tg.showPopup({
+                title: 'Ошибка',
+                message: 'Недостаточно данных для создания заявки',
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Недостаточно данных для создания заявки');
+        }
+        return;
+    }
+    
+    // Проверяем наличие фото чека (если требуется по настройкам)
+    if (requireReceiptPhoto && !receiptFile) {
+        if (tg) {
+            tg.showPopup({
+                title: 'Внимание',
+                message: 'Пожалуйста, прикрепите фото чека об оплате. Это обязательно для подтверждения платежа.',
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Пожалуйста, прикрепите фото чека об оплате. Это обязательно для подтверждения платежа.');
+        }
+        return;
+    }
+    
+    // Блокируем кнопку
+    paidButton.disabled = true;
+    paidButton.classList.add('loading');
+    
+    try {
+        let receiptBase64 = null;
+        
+        // Конвертируем фото чека в base64 (обязательно)
+        if (receiptFile) {
+            const reader = new FileReader();
+            receiptBase64 = await new Promise((resolve, reject) => {
+                reader.onload = (e) => {
+                    const base64 = e.target.result.split(',')[1];
+                    resolve(base64);
+                };
+                reader.onerror = reject;
+                reader.readAsDataURL(receiptFile);
+            });
+        }
+        
+        // Если заявка уже существует (requestId), обновляем её
+        // Проверяем, что requestId не пустой и является валидным числом
+        if (requestId && requestId.trim() !== '' && !isNaN(parseInt(requestId))) {
+            const updateData = {
+                id: parseInt(requestId)
+            };
+            
+            if (receiptBase64) {
+                updateData.receipt_photo = receiptBase64;
+            }
+            
+            if (telegramUserId) {
+                updateData.telegram_user_id = telegramUserId;
+            }
+            
+            console.log('📤 Updating existing request:', {
+                id: updateData.id,
+                has_receipt: !!updateData.receipt_photo
+            });
+            
+            let response;
+            try {
+                // Создаем AbortController для таймаута
+                const controller = new AbortController();
+                const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 секунд таймаут
+                
+                response = await fetch('https://fqxgmrzplndwsyvkeu.ru/api/payment', {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(updateData),
+                    signal: controller.signal
+                });
+                
+                clearTimeout(timeoutId);
+            } catch (fetchError) {
+                console.error('❌ Fetch error:', fetchError);
+                if (fetchError.name === 'AbortError') {
+                    throw new Error('Превышено время ожидания ответа от сервера. Попробуйте еще раз.');
+                } else if (fetchError.message && fetchError.message.includes('Failed to fetch')) {
+                    throw new Error('Не удалось подключиться к серверу. Проверьте интернет-соединение и попробуйте еще раз.');
+                } else {
+                    throw new Error(fetchError.message || 'Ошибка при отправке запроса. Попробуйте еще раз.');
+                }
+            }
+            
+            if (!response.ok) {
+                const errorText = await response.text();
+                console.error('❌ Response error:', response.status, errorText);
+                throw new Error(`Ошибка сервера (${response.status}): ${errorText.substring(0, 100)}`);
+            }
+            
+            let data;
+            try {
+                data = await response.json();
+            } catch (jsonError) {
+                console.error('❌ JSON parse error:', jsonError);
+                const text = await response.text();
+                throw new Error(`Неверный ответ от сервера: ${text.substring(0, 100)}`);
+            }
+            
+            if (data.success) {
+                if (tg) {
+                    tg.showPopup({
+                        title: '✅ Успешно',
+                        message: 'Заявка обновлена! Ожидайте подтверждения.',
+                        buttons: [{ 
+                            type: 'ok',
+                            text: 'ОК'
+                        }]
+                    });
+                    
+                    setTimeout(() => {
+                        tg.close();
+                    }, 1500);
+                } else {
+                    alert('✅ Заявка обновлена! Ожидайте подтверждения.');
+                }
+            } else {
+                throw new Error(data.error || 'Не удалось обновить заявку');
+            }
+        } else {
+            // Создаем новую заявку
+            const requestData = {
+                telegram_user_id: telegramUserId,
+                type: 'deposit',
+                amount: amount,
+                bookmaker: casinoId,
+                account_id: accountId,
+                telegram_username: username || null,
+                telegram_first_name: firstName || null,
+                telegram_last_name: lastName || null
+            };
+            
+            if (receiptBase64) {
+                requestData.receipt_photo = receiptBase64;
+            }
+            
+            console.log('📤 Creating new request:', {
+                telegram_user_id: requestData.telegram_user_id,
+                amount: requestData.amount,
+                bookmaker: requestData.bookmaker,
+                account_id: requestData.account_id,
+                has_receipt: !!requestData.receipt_photo
+            });
+            
+            let response;
+            try {
+                // Создаем AbortController для таймаута
+                const controller = new AbortController();
+                const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 секунд таймаут
+                
+                response = await fetch('https://fqxgmrzplndwsyvkeu.ru/api/payment', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(requestData),
+                    signal: controller.signal
+                });
+                
+                clearTimeout(timeoutId);
+            } catch (fetchError) {
+                console.error('❌ Fetch error:', fetchError);
+                if (fetchError.name === 'AbortError') {
+                    throw new Error('Превышено время ожидания ответа от сервера. Попробуйте еще раз.');
+                } else if (fetchError.message && fetchError.message.includes('Failed to fetch')) {
+                    throw new Error('Не удалось подключиться к серверу. Проверьте интернет-соединение и попробуйте еще раз.');
+                } else {
+                    throw new Error(fetchError.message || 'Ошибка при отправке запроса. Попробуйте еще раз.');
+                }
+            }
+            
+            if (!response.ok) {
+                const errorText = await response.text();
+                console.error('❌ Response error:', response.status, errorText);
+                throw new Error(`Ошибка сервера (${response.status}): ${errorText.substring(0, 100)}`);
+            }
+            
+            let data;
+            try {
+                data = await response.json();
+            } catch (jsonError) {
+                console.error('❌ JSON parse error:', jsonError);
+                const text = await response.text();
+                throw new Error(`Неверный ответ от сервера: ${text.substring(0, 100)}`);
+            }
+            
+            if (data.success) {
+                // Сохраняем ID созданной заявки
+                requestId = data.data?.id || data.data?.transactionId;
+                
+                if (tg) {
+                    tg.showPopup({
+                        title: '✅ Успешно',
+                        message: 'Заявка создана! Ожидайте подтверждения.',
+                        buttons: [{ 
+                            type: 'ok',
+                            text: 'ОК'
+                        }]
+                    });
+                    
+                    // Закрываем WebApp и возвращаем в бота
+                    setTimeout(() => {
+                        tg.close();
+                    }, 1500);
+                } else {
+                    alert('✅ Заявка создана! Ожидайте подтверждения.');
+                }
+            } else {
+                throw new Error(data.error || 'Не удалось создать заявку');
+            }
+        }
+    } catch (error) {
+        console.error('❌ Error submitting payment:', error);
+        console.error('❌ Error details:', {
+            name: error.name,
+            message: error.message,
+            stack: error.stack,
+            type: typeof error
+        });
+        
+        // Разблокируем кнопку
+        paidButton.disabled = false;
+        paidButton.classList.remove('loading');
+        
+        let errorMessage = 'Не удалось отправить заявку. Попробуйте еще раз.';
+        if (error.message) {
+            errorMessage = error.message;
+        } else if (error.name === 'TypeError' && error.message && error.message.includes('fetch')) {
+            errorMessage = 'Ошибка сети. Проверьте интернет-соединение и попробуйте еще раз.';
+        }
+        
+        if (tg) {
+            tg.showPopup({
+                title: 'Ошибка',
+                message: errorMessage,
+                buttons: [{ type: 'ok' }]
+            });
+        } else {
+            alert('Ошибка: ' + errorMessage);
+        }
+    }
+};
+
+// Инициализация при загрузке страницы
+if (tg && tg.initDataUnsafe?.user) {
+    console.log('✅ Telegram WebApp initialized');
+} else {
+    console.warn('⚠️ Not in Telegram WebApp, but continuing anyway');
+}
+
+// Инициализируем все компоненты (всегда, независимо от Telegram)
+initReceiptUpload();
+
+// Настройки, QR и кнопки банков одним запросом; при ошибке - по отдельности, как раньше
+loadBootstrap().catch((error) => {
+    console.error('❌ Bootstrap failed, loading separately:', error);
+    return loadPaymentSettings().then(() => {
+        setupBankButtons(); // Показываем банки после загрузки настроек
+        loadQR(); // Загружаем QR код
+    });
+}).catch((error) => {
+    console.error('❌ Error initializing payment form:', error);
+    // В случае ошибки все равно показываем форму с настройками по умолчанию
+    setupBankButtons();
+    loadQR();
+}).finally(() => {
+    watchPaymentSettings(); // Дальше настройки обновляются по изменениям в админке
+});
@@ -0,0 +1,149 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import qrcode
+import qrcode.image.svg
+
+# (данные QR, размер модуля, формат)
+RenderKey = Tuple[str, int, str]
+
+# Форматы, которые отдает /qr/<key>.<ext>, и их Content-Type
+QR_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Ограничение на длину данных в адресе, чтобы не рендерить произвольно большие QR
+MAX_QR_DATA_LENGTH = 2048
+
+
+# Длина подписи в начале ключа: 16 байт HMAC-SHA256 в base64url
+_SIGNATURE_LENGTH = 22
+
+
+def _sign(payload: str, secret: bytes) -> str:
+    digest = hmac.new(secret, payload.encode('ascii'), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+
+def encode_qr_key(data: str, secret: bytes) -> str:
+    """Ключ для адреса /qr/<key>.<ext>: подпись + данные QR в base64url без '='.
+
+    Подпись ставит только сервер (qr_image_url), поэтому по адресу рисуются лишь
+    те QR, которые сервер собрал сам.
+    """
+    payload = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+    return _sign(payload, secret) + payload
+
+
+def decode_qr_key(key: str, secret: bytes) -> Optional[str]:
+    """Данные QR из ключа адреса; None - ключ некорректный или подпись не сходится"""
+    if not key or len(key) > _SIGNATURE_LENGTH + MAX_QR_DATA_LENGTH * 4 // 3 + 4:
+        return None
+    signature, payload = key[:_SIGNATURE_LENGTH], key[_SIGNATURE_LENGTH:]
+    try:
+        if not payload or not hmac.compare_digest(signature, _sign(payload, secret)):
+            return None
+        return base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def qr_etag(data: str, box_size: int, fmt: str) -> str:
+    """Сильный ETag: изображение полностью определяется данными, размером и форматом"""
+    digest = hashlib.sha256(f'{fmt}:{box_size}:{data}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def render_qr(data: str, box_size: int = 10, fmt: str = 'png') -> bytes:
+    """Нарисовать QR код (выполняется в отдельном процессе)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = io.BytesIO()
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathFillImage)
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffer, format=fmt.upper())
+    return buffer.getvalue()
+
+
+class QRRenderCache:
+    """LRU-кеш готовых изображений QR.
+
+    Холодный рендер выполняется в пуле процессов, чтобы Pillow не блокировал
+    event loop сервера. Одновременные запросы одного и того же QR ждут один рендер.
+    """
+
+    def __init__(self, max_items: int = 1024, workers: Optional[int] = None):
+        self.max_items = max_items
+        self.workers = workers
+        self._items: 'OrderedDict[RenderKey, bytes]' = OrderedDict()
+        self._inflight: Dict[RenderKey, asyncio.Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def get(self, data: str, box_size: int = 10, fmt: str = 'png') -> bytes:
+        """Изображение QR из кеша или свежий рендер"""
+        key = (data, box_size, fmt)
+        image = self._items.get(key)
+        if image is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        future = self._inflight.get(key)
+        if future is None:
+            self.start()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._pool, render_qr, data, box_size, fmt)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        return await asyncio.shield(future)
+
+    def _done(self, key: RenderKey, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.renders += 1
+        self._items[key] = future.result()
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'items': len(self._items),
+            'max_items': self.max_items,
+            'bytes': sum(len(image) for image in self._items.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'renders': self.renders,
+            'inflight': len(self._inflight),
+        }
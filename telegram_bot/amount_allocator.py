@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis нужен только для AMOUNT_ALLOCATOR=redis
+    aioredis = None
+
+from config import Config
+from emv_qr import amount_cents
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+# Копейки, которые добавляются к сумме пополнения
+CENTS_RANGE = range(1, 100)
+
+
+class MemoryReservations:
+    """Резервы сумм в памяти процесса (только для одного процесса бота)"""
+
+    def __init__(self):
+        self._expires: Dict[int, float] = {}
+
+    async def reserve(self, candidates: List[int], ttl: float) -> Optional[int]:
+        now = time.time()
+        for cents in candidates:
+            if self._expires.get(cents, 0) <= now:
+                self._expires[cents] = now + ttl
+                return cents
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteReservations:
+    """Резервы сумм в SQLite: общий файл для всех процессов бота на одной машине"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS amount_reservations ('
+                ' amount_cents INTEGER PRIMARY KEY,'
+                ' expires_at REAL NOT NULL)'
+            )
+
+    def _reserve(self, candidates: List[int], ttl: float) -> Optional[int]:
+        now = time.time()
+        placeholders = ','.join('?' * len(candidates))
+        with self._lock:
+            # BEGIN IMMEDIATE: второй процесс ждет, пока первый не выберет сумму
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                taken = {
+                    row[0] for row in self._conn.execute(
+                        f'SELECT amount_cents FROM amount_reservations '
+                        f'WHERE expires_at > ? AND amount_cents IN ({placeholders})',
+                        (now, *candidates)
+                    )
+                }
+                chosen = next((cents for cents in candidates if cents not in taken), None)
+                if chosen is not None:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO amount_reservations (amount_cents, expires_at) VALUES (?, ?)',
+                        (chosen, now + ttl)
+                    )
+                self._conn.execute('DELETE FROM amount_reservations WHERE expires_at <= ?', (now,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return chosen
+
+    async def reserve(self, candidates: List[int], ttl: float) -> Optional[int]:
+        return await asyncio.to_thread(self._reserve, candidates, ttl)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisReservations:
+    """Резервы сумм в Redis (SET NX EX): общие для процессов на разных машинах"""
+
+    def __init__(self, url: str, prefix: str = 'deposit_amount:'):
+        if aioredis is None:
+            raise RuntimeError('Для AMOUNT_ALLOCATOR=redis установите пакет redis')
+        self._redis = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def reserve(self, candidates: List[int], ttl: float) -> Optional[int]:
+        for cents in candidates:
+            if await self._redis.set(f'{self._prefix}{cents}', 1, nx=True, px=int(ttl * 1000)):
+                return cents
+        return None
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class AmountAllocator:
+    """Выдает сумму пополнения с копейками, уникальную среди ожидающих оплаты.
+
+    Сумма резервируется на ttl с момента выдачи: окно оплаты (payment_window,
+    срок передается в ссылке на оплату) плюс окно сопоставления платежей, чтобы
+    payment_matcher не увидел две заявки с одной суммой.
+    Локальный индекс в памяти помнит занятые суммы, чтобы не проверять
+    их в общем хранилище повторно; само резервирование атомарно в хранилище,
+    поэтому два процесса бота не выдадут одну и ту же сумму.
+    """
+
+    def __init__(self, backend, ttl: float, payment_window: float, latency_samples: int = 1000):
+        self.backend = backend
+        self.ttl = ttl
+        self.payment_window = payment_window
+        self._known: Dict[int, float] = {}
+        self._latencies = deque(maxlen=latency_samples)
+        self.allocations = 0
+        self.exhausted = 0
+        self.errors = 0
+
+    async def allocate(self, amount: float) -> Tuple[float, float]:
+        """Сумма amount + 0.01..0.99, не занятая другой ожидающей оплаты заявкой,
+        и время (unix), до которого ее нужно оплатить"""
+        started = time.perf_counter()
+        base = amount_cents(amount)
+        now = time.time()
+        candidates = [base + cents for cents in CENTS_RANGE]
+        random.shuffle(candidates)
+        # Сначала суммы, которые по локальному индексу свободны
+        candidates.sort(key=lambda cents: self._known.get(cents, 0) > now)
+        try:
+            chosen = await self.backend.reserve(candidates, self.ttl)
+        except Exception as e:
+            logger.error(f"Error reserving deposit amount: {e}")
+            self.errors += 1
+            chosen = None
+        if chosen is None:
+            # Все суммы заняты (или хранилище недоступно) - как раньше, случайные копейки
+            self.exhausted += 1
+            chosen = random.choice(candidates)
+        else:
+            self._known[chosen] = now + self.ttl
+            self.allocations += 1
+        if len(self._known) > 10000:
+            self._known = {cents: exp for cents, exp in self._known.items() if exp > now}
+        self._latencies.append(time.perf_counter() - started)
+        return chosen / 100, now + self.payment_window
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, float]:
+        latencies = sorted(self._latencies)
+        return {
+            'allocations': self.allocations,
+            'exhausted': self.exhausted,
+            'errors': self.errors,
+            'known_reserved': sum(1 for exp in self._known.values() if exp > time.time()),
+            'latency_ms_p50': percentile(latencies, 0.5, 1000),
+            'latency_ms_p99': percentile(latencies, 0.99, 1000),
+            'latency_ms_max': percentile(latencies, 1.0, 1000),
+        }
+
+
+def create_allocator() -> AmountAllocator:
+    """Аллокатор сумм по настройке AMOUNT_ALLOCATOR (sqlite, redis или memory)"""
+    if Config.AMOUNT_ALLOCATOR == 'memory':
+        backend = MemoryReservations()
+    elif Config.AMOUNT_ALLOCATOR == 'redis':
+        backend = RedisReservations(Config.AMOUNT_REDIS_URL)
+    else:
+        backend = SQLiteReservations(Config.AMOUNT_SQLITE_PATH)
+    return AmountAllocator(backend, ttl=Config.AMOUNT_RESERVATION_TTL, payment_window=Config.PAYMENT_WINDOW)
+
+
+amount_allocator = create_allocator()
@@ -1,16 +1,112 @@
+import asyncio
 import aiohttp
 import ssl
 from config import Config
-from typing import Optional, Dict, Any
+from settings_cache import SettingsCache
+from settings_feed import SettingsFeed
+from emv_qr import build_qr_response
+from endpoints import EndpointPool
+from typing import Optional, Dict, Any, List
 
 # Отключаем проверку SSL для внутренних запросов
 ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
+def _api_urls() -> List[str]:
+    """Адреса API в порядке приоритета (локальный API страхуется продакшном)"""
+    urls = [Config.API_BASE_URL]
+    if Config.API_BASE_URL.startswith('http://localhost') and Config.API_FALLBACK_URL != Config.API_BASE_URL:
+        urls.append(Config.API_FALLBACK_URL)
+    return urls
+
+# Ответ админки (/public/generate-qr), когда активный реквизит не выбран
+NO_ACTIVE_REQUISITE_ERROR = 'No active wallet configured. Please select an active wallet in admin panel.'
+
 class APIClient:
+    # Общая сессия с пулом соединений (открывается в bot.py:main)
+    _session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    async def start(cls) -> None:
+        """Открыть общую HTTP-сессию с пулом keep-alive соединений"""
+        if cls._session is not None and not cls._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=Config.API_POOL_LIMIT,
+            limit_per_host=Config.API_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=Config.API_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=Config.API_DNS_CACHE_TTL,
+        )
+        cls._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=Config.API_TIMEOUT,
+                connect=Config.API_CONNECT_TIMEOUT,
+            ),
+        )
+        # Первая проверка адресов API и фоновый prober
+        await cls.endpoints.start(cls.get_session)
+
+    @classmethod
+    async def close(cls) -> None:
+        """Закрыть общую HTTP-сессию"""
+        await cls.endpoints.stop()
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+    @classmethod
+    async def get_session(cls) -> aiohttp.ClientSession:
+        """Получить общую сессию (открывается лениво, если start() не вызывался)"""
+        if cls._session is None or cls._session.closed:
+            await cls.start()
+        return cls._session
+
     @staticmethod
+    def _timeout(seconds: Optional[float]) -> Optional[aiohttp.ClientTimeout]:
+        """Таймаут для отдельного вызова (None - таймаут сессии по умолчанию)"""
+        if seconds is None:
+            return None
+        return aiohttp.ClientTimeout(total=seconds)
+
+    @classmethod
+    async def _request(
+        cls, method: str, path: str, idempotent: bool, raise_server_errors: bool = False, **kwargs
+    ) -> Dict[str, Any]:
+        """Запрос к здоровому адресу API с переключением на резервный.
+
+        При ошибке соединения (запрос точно не ушел) пробуем следующий здоровый адрес.
+        По таймауту повторяем только идемпотентные запросы.
+        raise_server_errors: ответ 5xx - исключение (запрос можно повторить позже).
+        """
+        session = await cls.get_session()
+        # timeout=None в aiohttp отключает таймаут - оставляем таймаут сессии
+        if kwargs.get('timeout') is None:
+            kwargs.pop('timeout', None)
+        while True:
+            base_url = cls.endpoints.current()
+            try:
+                async with session.request(method, f'{base_url}{path}', **kwargs) as response:
+                    if raise_server_errors and response.status >= 500:
+                        response.raise_for_status()
+                    data = await response.json()
+                cls.endpoints.record_success(base_url)
+                return data
+            except aiohttp.ClientConnectorError:
+                cls.endpoints.record_failure(base_url)
+                if not cls.endpoints.has_alternative(base_url):
+                    raise
+            except asyncio.TimeoutError:
+                cls.endpoints.record_failure(base_url)
+                if not idempotent or not cls.endpoints.has_alternative(base_url):
+                    raise
+
+    @classmethod
     async def create_request(
+        cls,
         telegram_user_id: str,
         request_type: str,
         amount: float,
@@ -23,99 +119,161 @@ class APIClient:
         telegram_last_name: Optional[str] = None,
         receipt_photo: Optional[str] = None,
         withdrawal_code: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """Создать заявку на пополнение или вывод"""
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            data = {
-                'telegram_user_id': str(telegram_user_id),
-                'type': request_type,
-                'amount': amount,
-            }
-            
-            if bookmaker:
-                data['bookmaker'] = bookmaker
-            if bank:
-                data['bank'] = bank
-            if phone:
-                data['phone'] = phone
-            if account_id:
-                data['account_id'] = account_id
-            if telegram_username:
-                data['telegram_username'] = telegram_username
-            if telegram_first_name:
-                data['telegram_first_name'] = telegram_first_name
-            if telegram_last_name:
-                data['telegram_last_name'] = telegram_last_name
-            if receipt_photo:
-                data['receipt_photo'] = receipt_photo
-            if withdrawal_code:
-                data['withdrawal_code'] = withdrawal_code
-            
-            # Пробуем сначала локальный API, если не доступен - используем продакшн
-            api_url = Config.API_BASE_URL
-            if api_url.startswith('http://localhost'):
-                try:
-                    async with session.post(
-                        f'{api_url}/payment',
-                        json=data,
-                        timeout=aiohttp.ClientTimeout(total=2)
-                    ) as response:
-                        return await response.json()
-                except:
-                    # Если локальный недоступен, используем продакшн
-                    api_url = 'https://fqxgmrzplndwsyvkeu.ru/api'
-            
-            async with session.post(
-                f'{api_url}/payment',
-                json=data
-            ) as response:
-                return await response.json()
-    
-    @staticmethod
-    async def generate_qr(amount: float, bank: str) -> Dict[str, Any]:
-        """Генерировать QR код для оплаты"""
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.post(
-                f'{Config.API_BASE_URL}/public/generate-qr',
-                json={'amount': amount, 'bank': bank}
-            ) as response:
-                return await response.json()
-    
-    @staticmethod
-    async def get_payment_settings() -> Dict[str, Any]:
-        """Получить настройки платежей из админки"""
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            try:
-                # Пробуем сначала локальный API, если не доступен - используем продакшн
-                api_url = Config.API_BASE_URL
-                if api_url.startswith('http://localhost'):
-                    try:
-                        # Проверяем доступность локального API
-                        async with session.get(
-                            f'{api_url}/public/payment-settings',
-                            timeout=aiohttp.ClientTimeout(total=2)
-                        ) as test_response:
-                            if test_response.status == 200:
-                                async with session.get(
-                                    f'{api_url}/public/payment-settings'
-                                ) as response:
-                                    return await response.json()
-                    except:
-                        # Если локальный недоступен, используем продакшн
-                        api_url = 'https://fqxgmrzplndwsyvkeu.ru/api'
-                
-                async with session.get(
-                    f'{api_url}/public/payment-settings'
-                ) as response:
-                    data = await response.json()
-                    return data if data.get('success') else {}
-            except Exception as e:
-                print(f"Error fetching payment settings: {e}")
-                return {}
+        """Создать заявку на пополнение или вывод.
+
+        С idempotency_key повторная отправка не создает дубль заявки, а ответ 5xx
+        поднимается исключением, чтобы отправку можно было повторить (см. outbox.py).
+        """
+        data = {
+            'telegram_user_id': str(telegram_user_id),
+            'type': request_type,
+            'amount': amount,
+        }
+
+        if bookmaker:
+            data['bookmaker'] = bookmaker
+        if bank:
+            data['bank'] = bank
+        if phone:
+            data['phone'] = phone
+        if account_id:
+            data['account_id'] = account_id
+        if telegram_username:
+            data['telegram_username'] = telegram_username
+        if telegram_first_name:
+            data['telegram_first_name'] = telegram_first_name
+        if telegram_last_name:
+            data['telegram_last_name'] = telegram_last_name
+        if receipt_photo:
+            data['receipt_photo'] = receipt_photo
+        if withdrawal_code:
+            data['withdrawal_code'] = withdrawal_code
+        if idempotency_key:
+            data['idempotency_key'] = idempotency_key
+
+        return await cls._request(
+            'POST', '/payment',
+            idempotent=idempotency_key is not None,
+            raise_server_errors=idempotency_key is not None,
+            json=data,
+            timeout=cls._timeout(timeout)
+        )
+
+    @classmethod
+    async def generate_qr(cls, amount: float, bank: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Генерировать QR код для оплаты.
+
+        QR собирается локально из закешированного активного реквизита;
+        если реквизит получить не удалось - запрос к админке как раньше.
+        Если в админке нет активного реквизита - та же ошибка, что у админки.
+        """
+        cached = await cls._requisite_cache.get()
+        requisite = cached.get('value')
+        if 'id' in cached and not requisite:
+            return {'success': False, 'error': NO_ACTIVE_REQUISITE_ERROR}
+        if requisite and amount > 0:
+            settings = await cls.get_payment_settings()
+            enabled_banks = settings.get('deposits', {}).get('banks')
+            return build_qr_response(requisite, amount, bank, enabled_banks)
+        return await cls._request(
+            'POST', '/public/generate-qr',
+            idempotent=True,
+            json={'amount': amount, 'bank': bank},
+            timeout=cls._timeout(timeout)
+        )
+
+    @classmethod
+    async def get_payment_settings(cls) -> Dict[str, Any]:
+        """Получить настройки платежей (из кеша, с фоновым обновлением).
+
+        'stale': True - API недоступен, это последние сохраненные настройки.
+        """
+        return await cls._settings_cache.get()
+
+    @classmethod
+    def settings_cache_stats(cls) -> Dict[str, Any]:
+        """Статистика кеша настроек (попадания/промахи)"""
+        return cls._settings_cache.stats()
+
+    @classmethod
+    def requisite_cache_stats(cls) -> Dict[str, Any]:
+        """Статистика кеша активного реквизита"""
+        return cls._requisite_cache.stats()
+
+    @classmethod
+    async def fetch_active_requisite(cls, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Получить активный реквизит из админки.
+
+        {} - запрос не удался (кеш оставит прежний реквизит),
+        {'id': None, 'value': None} - активного реквизита нет.
+        """
+        try:
+            data = await cls._request(
+                'GET', '/public/requisites/list',
+                idempotent=True,
+                timeout=cls._timeout(timeout)
+            )
+        except Exception as e:
+            print(f"Error fetching active requisite: {e}")
+            return {}
+        if not data.get('success'):
+            return {}
+        for requisite in data.get('requisites', []):
+            if requisite.get('id') == data.get('active_id'):
+                return requisite
+        return {'id': None, 'value': None}
+
+    @classmethod
+    async def poll_settings_changes(cls, since: int, wait: float) -> Dict[str, Any]:
+        """Дождаться настроек новее версии since (long-poll, не дольше wait секунд)"""
+        return await cls._request(
+            'GET', '/public/payment-settings/changes',
+            idempotent=True,
+            params={'since': since, 'wait': int(wait)},
+            timeout=cls._timeout(wait + Config.API_TIMEOUT)
+        )
+
+    @classmethod
+    async def fetch_payment_settings(cls, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Получить настройки платежей из админки (запрос к API без кеша)"""
+        try:
+            data = await cls._request(
+                'GET', '/public/payment-settings',
+                idempotent=True,
+                timeout=cls._timeout(timeout)
+            )
+            return data if data.get('success') else {}
+        except Exception as e:
+            print(f"Error fetching payment settings: {e}")
+            return {}
 
+# Адреса API с circuit breaker (локальный API проверяется в фоне)
+APIClient.endpoints = EndpointPool(
+    _api_urls(),
+    probe_path=Config.API_HEALTH_PROBE_PATH,
+    probe_interval=Config.API_HEALTH_PROBE_INTERVAL,
+    probe_timeout=Config.API_HEALTH_PROBE_TIMEOUT,
+    failure_threshold=Config.API_CIRCUIT_FAILURE_THRESHOLD,
+)
 
+# Кеш настроек платежей (общий для всех хендлеров)
+APIClient._settings_cache = SettingsCache(
+    APIClient.fetch_payment_settings,
+    ttl=Config.SETTINGS_CACHE_TTL,
+    snapshot_path=Config.SETTINGS_SNAPSHOT_PATH,
+)
 
+# Кеш активного реквизита для локальной сборки QR
+APIClient._requisite_cache = SettingsCache(APIClient.fetch_active_requisite, ttl=Config.REQUISITE_CACHE_TTL)
 
+# Подписка на изменения настроек (запускается в bot.py:main); смена реквизита
+# в админке тоже меняет версию настроек - кеш реквизита перечитывается сразу
+APIClient.settings_feed = SettingsFeed(
+    APIClient.poll_settings_changes,
+    APIClient._settings_cache,
+    wait=Config.SETTINGS_FEED_WAIT,
+    linked=[APIClient._requisite_cache],
+)
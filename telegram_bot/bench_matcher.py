@@ -0,0 +1,152 @@
+"""Нагрузочный прогон payment_matcher на синтетических платежах.
+
+    python bench_matcher.py                 # 100000 платежей, локальная база DATABASE_URL
+    python bench_matcher.py --count 20000   # другое число платежей
+    python bench_matcher.py --memory        # только индекс в памяти, без базы
+
+В базе создается отдельная схема matcher_bench с таблицами requests и
+incoming_payments (те же колонки, что у Prisma); рабочие данные не затрагиваются,
+после прогона схема удаляется (--keep - оставить).
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from config import Config
+from db import create_pool
+from payment_matcher import IncomingPayment, MatchIndex, PaymentMatcher, PendingDeposit
+
+BANKS = ['omoney', 'mbank', 'bakai', 'megapay', 'demir', 'balance']
+# Доля платежей без заявки и доля платежей без распознанного банка
+NOISE_SHARE = 0.05
+NO_BANK_SHARE = 0.1
+
+SCHEMA_SQL = '''
+    DROP SCHEMA IF EXISTS matcher_bench CASCADE;
+    CREATE SCHEMA matcher_bench;
+    CREATE TABLE matcher_bench.requests (
+        id serial PRIMARY KEY,
+        request_type varchar(20) NOT NULL,
+        status varchar(20) NOT NULL DEFAULT 'pending',
+        status_detail varchar(50),
+        amount decimal(10, 2),
+        bank varchar(100),
+        created_at timestamp(3) NOT NULL,
+        updated_at timestamp(3) NOT NULL DEFAULT now()
+    );
+    CREATE INDEX ON matcher_bench.requests (status);
+    CREATE INDEX ON matcher_bench.requests (created_at);
+    CREATE TABLE matcher_bench.incoming_payments (
+        id serial PRIMARY KEY,
+        amount decimal(10, 2) NOT NULL,
+        bank varchar(50),
+        payment_date timestamp(3) NOT NULL,
+        request_id int REFERENCES matcher_bench.requests (id) ON DELETE SET NULL,
+        is_processed boolean NOT NULL DEFAULT false,
+        updated_at timestamp(3) NOT NULL DEFAULT now()
+    );
+    CREATE INDEX ON matcher_bench.incoming_payments (amount, is_processed);
+    CREATE INDEX ON matcher_bench.incoming_payments (payment_date);
+'''
+
+
+def generate(count: int, window: float, seed: int = 1):
+    """Заявки и платежи: суммы уникальны, как их выдает amount_allocator"""
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    amounts = rnd.sample(range(10000, 10000 + count * 20), count)
+    deposits, payments = [], []
+    for i, cents in enumerate(amounts, start=1):
+        bank = rnd.choice(BANKS)
+        created_at = now - timedelta(seconds=rnd.uniform(0, window / 2))
+        paid_at = created_at + timedelta(seconds=rnd.uniform(-60, 300))
+        if rnd.random() >= NOISE_SHARE:
+            deposits.append((i, cents, bank, created_at))
+        payment_bank = None if rnd.random() < NO_BANK_SHARE else bank
+        payments.append((i, cents, payment_bank, paid_at))
+    return deposits, payments
+
+
+def bench_memory(count: int, window: float) -> None:
+    deposits, payments = generate(count, window)
+    index = MatchIndex(timedelta(seconds=window))
+    started = time.perf_counter()
+    for i, cents, bank, created_at in deposits:
+        index.add(PendingDeposit(i, cents, bank, created_at))
+    loaded = time.perf_counter()
+    matched = correct = 0
+    for i, cents, bank, paid_at in sorted(payments, key=lambda p: (p[3], p[0])):
+        deposit = index.match(IncomingPayment(i, cents, bank, paid_at))
+        if deposit is not None:
+            matched += 1
+            correct += deposit.id == i
+    finished = time.perf_counter()
+    print(f"Заявок: {len(deposits)}, платежей: {len(payments)}")
+    print(f"Загрузка индекса: {(loaded - started) * 1000:.1f} мс")
+    print(f"Сопоставление: {(finished - loaded) * 1000:.1f} мс "
+          f"({len(payments) / (finished - loaded):,.0f} платежей/с)")
+    print(f"Сопоставлено: {matched}, верно: {correct}")
+
+
+async def bench_database(count: int, window: float, batch_size: int, keep: bool) -> None:
+    pool = await create_pool(Config.DATABASE_URL, min_size=1, max_size=2,
+                             server_settings={'search_path': 'matcher_bench'})
+    try:
+        await pool.execute(SCHEMA_SQL)
+        deposits, payments = generate(count, window)
+        async with pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                'requests', schema_name='matcher_bench',
+                columns=['id', 'request_type', 'amount', 'bank', 'created_at'],
+                records=[(i, 'deposit', Decimal(cents) / 100, bank, created_at)
+                         for i, cents, bank, created_at in deposits],
+            )
+            await conn.copy_records_to_table(
+                'incoming_payments', schema_name='matcher_bench',
+                columns=['id', 'amount', 'bank', 'payment_date'],
+                records=[(i, Decimal(cents) / 100, bank, paid_at)
+                         for i, cents, bank, paid_at in payments],
+            )
+            await conn.execute('ANALYZE')
+
+        matcher = PaymentMatcher(pool, window=window, batch_size=batch_size, reload_interval=float('inf'))
+        matcher._reloaded_at = time.monotonic()
+        started = time.perf_counter()
+        while True:
+            await matcher.run_once()
+            if matcher._last_payment_id >= len(payments):
+                break
+        elapsed = time.perf_counter() - started
+
+        wrong = await pool.fetchval(
+            'SELECT count(*) FROM incoming_payments p JOIN requests r ON r.id = p.request_id '
+            'WHERE p.amount <> r.amount OR p.id <> r.id'
+        )
+        print(f"Заявок: {len(deposits)}, платежей: {len(payments)}")
+        print(f"Время: {elapsed:.2f} с ({len(payments) / elapsed:,.0f} платежей/с), пачек: {matcher.batches}")
+        print(f"Сопоставлено: {matcher.matched}, неверно: {wrong}")
+        print(f"Статистика: {matcher.stats()}")
+    finally:
+        if not keep:
+            await pool.execute('DROP SCHEMA IF EXISTS matcher_bench CASCADE')
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон payment_matcher')
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=Config.MATCHER_BATCH_SIZE)
+    parser.add_argument('--memory', action='store_true', help='без базы, только индекс')
+    parser.add_argument('--keep', action='store_true', help='не удалять схему matcher_bench')
+    args = parser.parse_args()
+    if args.memory:
+        bench_memory(args.count, Config.MATCHER_WINDOW)
+    else:
+        asyncio.run(bench_database(args.count, Config.MATCHER_WINDOW, args.batch_size, args.keep))
+
+
+if __name__ == '__main__':
+    main()
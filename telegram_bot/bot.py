@@ -1,8 +1,19 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from config import Config
+from api_client import APIClient
+from web_server import register_stats, run_webhook, start_web_server, web_server_needed
+from storage import CachedStorage, create_storage
+from media_cache import warm_up
+from amount_allocator import amount_allocator
+from outbox import request_outbox
+from update_queue import OrderedUpdatesMiddleware
+from throttling import ThrottlingMiddleware
+from outbound import OutboundSender
+from broadcast_worker import BroadcastWorker
+from db import create_pool
+import keyboards
 from handlers import start, deposit, withdraw, language, instruction
 
 # Настройка логирования
@@ -18,9 +29,38 @@ async def main():
         logger.error("BOT_TOKEN не установлен! Проверьте файл .env")
         return
     
+    if Config.BOT_MODE not in ('polling', 'webhook'):
+        logger.error(f"Неизвестный BOT_MODE: {Config.BOT_MODE} (ожидается polling или webhook)")
+        return
+    
+    if Config.BOT_MODE == 'webhook' and not Config.WEBHOOK_SECRET:
+        logger.error("WEBHOOK_SECRET не установлен! Он обязателен в режиме webhook")
+        return
+    
     # Инициализация бота и диспетчера
     bot = Bot(token=Config.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    # Исходящие отправки: приоритет ответов над рассылками, лимиты Telegram, RetryAfter
+    sender = OutboundSender(
+        global_rate=Config.SEND_GLOBAL_RATE,
+        chat_rate=Config.SEND_CHAT_RATE,
+        chat_burst=Config.SEND_CHAT_BURST,
+        max_retries=Config.SEND_MAX_RETRIES,
+    )
+    bot.session.middleware(sender)
+    # Хранилище FSM (закрывается диспетчером при остановке)
+    storage = create_storage()
+    dp = Dispatcher(storage=storage)
+    # Общий лимит обработчиков и порядок обновлений внутри одного пользователя
+    update_queue = OrderedUpdatesMiddleware(
+        workers=Config.UPDATE_WORKERS,
+        queue_limit=Config.UPDATE_QUEUE_LIMIT,
+        user_queue_limit=Config.UPDATE_USER_QUEUE_LIMIT,
+    )
+    dp.update.outer_middleware(update_queue)
+    # Ограничение частоты действий пользователя (до обработчиков и запросов к API)
+    throttling = ThrottlingMiddleware(Config.THROTTLE_LIMITS)
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
     
     # Регистрация роутеров
     dp.include_router(start.router)
@@ -29,10 +69,76 @@ async def main():
     dp.include_router(language.router)
     dp.include_router(instruction.router)
     
-    logger.info("Бот запущен!")
+    # Общая HTTP-сессия к API (пул соединений на всё время работы бота)
+    await APIClient.start()
+    # Подписка на изменения настроек в админке (обновляет кеш настроек сразу)
+    APIClient.settings_feed.start()
+    # Доставка заявок из очереди (в том числе оставшихся с прошлого запуска)
+    await request_outbox.start()
+    # Рассылки из админки: через тот же sender, после ответов пользователям
+    broadcast_pool = None
+    broadcasts = None
+    if Config.DATABASE_URL and Config.BROADCAST_POLL_INTERVAL > 0:
+        try:
+            broadcast_pool = await create_pool(Config.DATABASE_URL, min_size=1, max_size=2)
+        except Exception as e:
+            logger.error(f"Рассылки отключены: нет подключения к базе ({e})")
+        else:
+            broadcasts = BroadcastWorker(
+                broadcast_pool,
+                bot,
+                chunk_size=Config.BROADCAST_CHUNK_SIZE,
+                concurrency=Config.BROADCAST_CONCURRENCY,
+                blocked_recheck=Config.BROADCAST_BLOCKED_RECHECK,
+                claim_ttl=Config.BROADCAST_CLAIM_TTL,
+            )
+            broadcasts.start(Config.BROADCAST_POLL_INTERVAL)
     
-    # Запуск polling
-    await dp.start_polling(bot)
+    if isinstance(storage, CachedStorage):
+        await storage.start()
+        register_stats('fsm', storage.memory_report)
+    register_stats('settings_cache', APIClient.settings_cache_stats)
+    register_stats('settings_feed', APIClient.settings_feed.stats)
+    register_stats('requisite_cache', APIClient.requisite_cache_stats)
+    register_stats('api_endpoints', APIClient.endpoints.stats)
+    register_stats('subscriptions', start.subscription_cache.stats)
+    register_stats('keyboards', keyboards.cache_stats)
+    register_stats('amount_allocator', amount_allocator.stats)
+    register_stats('outbox', request_outbox.stats)
+    register_stats('update_queue', update_queue.stats)
+    register_stats('throttling', throttling.stats)
+    register_stats('outbound', sender.stats)
+    
+    # Предзагрузка фото казино, чтобы первые пользователи получали их по file_id
+    if Config.MEDIA_WARMUP_CHAT_ID:
+        asyncio.create_task(warm_up(bot, int(Config.MEDIA_WARMUP_CHAT_ID)))
+    
+    logger.info(f"Бот запущен! Режим: {Config.BOT_MODE}")
+    
+    try:
+        if Config.BOT_MODE == 'webhook':
+            await run_webhook(dp, bot)
+        else:
+            # HTTP-сервер в режиме polling нужен только для прокси файлов и статистики
+            runner = await start_web_server(dp, bot) if web_server_needed() else None
+            try:
+                # Снимаем webhook, иначе Telegram не отдаст обновления через getUpdates
+                await bot.delete_webhook()
+                # Запуск polling (включая chat_member для кеша подписок)
+                await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+            finally:
+                if runner is not None:
+                    await runner.cleanup()
+    finally:
+        logger.info(f"Кеш настроек: {APIClient.settings_cache_stats()}")
+        await request_outbox.stop()
+        if broadcasts is not None:
+            await broadcasts.stop()
+        if broadcast_pool is not None:
+            await broadcast_pool.close()
+        await APIClient.settings_feed.stop()
+        await APIClient.close()
+        await amount_allocator.close()
 
 if __name__ == '__main__':
     try:
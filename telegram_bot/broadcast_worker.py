@@ -0,0 +1,228 @@
+"""Отправка рассылок из админки (broadcast_messages) фоновой задачей бота.
+
+Админка только ставит рассылку в очередь (is_sent = false). Воркер идет по
+пользователям пачками по возрастанию user_id (keyset, без OFFSET и без загрузки
+всех пользователей в память) и после каждой пачки сохраняет прогресс
+(last_user_id и счетчики) в саму рассылку. После перезапуска рассылка
+продолжается с сохраненного user_id.
+
+Воркер работает в процессе бота (bot.py:main) и отправляет через тот же
+OutboundSender внутри bulk_sends(): лимит Telegram на бота общий, и ответы
+пользователям всегда идут раньше рассылки.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from outbound import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Метка в user_data: пользователь заблокировал бота (data_value - первая ошибка)
+BLOCKED_DATA_TYPE = 'broadcast_blocked'
+
+# Взять следующую рассылку: claimed_by - кто ее отправляет. Чужая рассылка
+# пропускается, пока ее отметка claimed_at свежее $2 секунд (отметка обновляется
+# после каждой пачки); SKIP LOCKED - два бота не возьмут одну рассылку одновременно
+CLAIM_BROADCAST_SQL = '''
+    UPDATE broadcast_messages
+    SET claimed_by = $1, claimed_at = now()
+    WHERE id = (
+        SELECT id FROM broadcast_messages
+        WHERE is_sent = false
+          AND (claimed_at IS NULL OR claimed_at < now() - make_interval(secs => $2))
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, message, last_user_id, started_at
+'''
+
+# Заблокировавшие бота пропускаются BROADCAST_BLOCKED_RECHECK секунд с последней
+# ошибки, потом пробуем снова: пользователь мог разблокировать бота
+USERS_SQL = f'''
+    SELECT u.user_id
+    FROM users u
+    WHERE u.user_id > $1
+      AND NOT EXISTS (
+        SELECT 1 FROM user_data d
+        WHERE d.user_id = u.user_id AND d.data_type = '{BLOCKED_DATA_TYPE}'
+          AND d.created_at > now() - make_interval(secs => $3)
+      )
+    ORDER BY u.user_id
+    LIMIT $2
+'''
+
+COUNT_USERS_SQL = f'''
+    SELECT count(*)
+    FROM users u
+    WHERE NOT EXISTS (
+        SELECT 1 FROM user_data d
+        WHERE d.user_id = u.user_id AND d.data_type = '{BLOCKED_DATA_TYPE}'
+          AND d.created_at > now() - make_interval(secs => $1)
+      )
+'''
+
+START_SQL = '''
+    UPDATE broadcast_messages
+    SET started_at = now(), updated_at = now(), total_users = $2
+    WHERE id = $1 AND claimed_by = $3
+'''
+
+CHECKPOINT_SQL = '''
+    UPDATE broadcast_messages
+    SET last_user_id = $2, updated_at = now(), claimed_at = now(),
+        sent_count = sent_count + $3, error_count = error_count + $4, blocked_count = blocked_count + $5
+    WHERE id = $1 AND claimed_by = $6
+'''
+
+FINISH_SQL = '''
+    UPDATE broadcast_messages
+    SET is_sent = true, sent_at = now(), updated_at = now(),
+        title = 'Рассылка ' || sent_count || ' пользователям - ' || to_char(now(), 'DD.MM.YYYY HH24:MI')
+    WHERE id = $1 AND claimed_by = $2
+'''
+
+MARK_BLOCKED_SQL = f'''
+    INSERT INTO user_data (user_id, data_type, data_value, created_at)
+    SELECT unnest($1::bigint[]), '{BLOCKED_DATA_TYPE}', $2, now()
+    ON CONFLICT (user_id, data_type) DO UPDATE SET created_at = now()
+'''
+
+
+def _updated(status: str) -> bool:
+    """UPDATE изменил строку (рассылка все еще за этим ботом)"""
+    return status.split()[-1] != '0'
+
+
+def is_blocked_error(error: Exception) -> bool:
+    """Пользователь недоступен навсегда: заблокировал бота, удален или чата нет"""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and 'chat not found' in str(error).lower()
+
+
+class BroadcastWorker:
+    def __init__(
+        self,
+        pool,
+        bot: Bot,
+        chunk_size: int = 500,
+        concurrency: int = 30,
+        blocked_recheck: float = 30 * 86400,
+        claim_ttl: float = 600,
+    ):
+        self.pool = pool
+        self.bot = bot
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.blocked_recheck = blocked_recheck
+        self.claim_ttl = claim_ttl
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._task: Optional[asyncio.Task] = None
+
+    async def _send(self, user_id: int, text: str, semaphore: asyncio.Semaphore) -> str:
+        async with semaphore:
+            try:
+                with bulk_sends():
+                    await self.bot.send_message(user_id, text, parse_mode=ParseMode.HTML)
+                return 'sent'
+            except Exception as e:
+                if is_blocked_error(e):
+                    return 'blocked'
+                logger.warning(f"Рассылка: ошибка отправки {user_id}: {e}")
+                return 'error'
+
+    async def send_chunk(self, user_ids: List[int], text: str) -> Dict[str, List[int]]:
+        """Отправить пачке пользователей параллельно (темп держит OutboundSender бота)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._send(user_id, text, semaphore) for user_id in user_ids))
+        outcome: Dict[str, List[int]] = {'sent': [], 'error': [], 'blocked': []}
+        for user_id, result in zip(user_ids, results):
+            outcome[result].append(user_id)
+        return outcome
+
+    async def process(self, broadcast_id: int, text: str, last_user_id: Optional[int], started: bool) -> None:
+        if not started:
+            total = await self.pool.fetchval(COUNT_USERS_SQL, self.blocked_recheck)
+            if not _updated(await self.pool.execute(START_SQL, broadcast_id, total, self.worker_id)):
+                logger.warning(f"Рассылка {broadcast_id}: взята другим ботом")
+                return
+            logger.info(f"Рассылка {broadcast_id}: начата, получателей {total}")
+        else:
+            logger.info(f"Рассылка {broadcast_id}: продолжаем после user_id {last_user_id}")
+
+        cursor = last_user_id or 0
+        sent_total = 0
+        began = time.monotonic()
+        while True:
+            rows = await self.pool.fetch(USERS_SQL, cursor, self.chunk_size, self.blocked_recheck)
+            if not rows:
+                break
+            user_ids = [row['user_id'] for row in rows]
+            chunk_started = time.monotonic()
+            outcome = await self.send_chunk(user_ids, text)
+            cursor = user_ids[-1]
+
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if outcome['blocked']:
+                        await conn.execute(MARK_BLOCKED_SQL, outcome['blocked'], f'broadcast {broadcast_id}')
+                    status = await conn.execute(
+                        CHECKPOINT_SQL, broadcast_id, cursor,
+                        len(outcome['sent']), len(outcome['error']), len(outcome['blocked']), self.worker_id,
+                    )
+            if not _updated(status):
+                # Пачка шла дольше claim_ttl, и рассылку продолжил другой бот
+                logger.warning(f"Рассылка {broadcast_id}: взята другим ботом, останавливаемся")
+                return
+
+            sent_total += len(user_ids)
+            rate = len(user_ids) / max(time.monotonic() - chunk_started, 1e-9)
+            logger.info(
+                f"Рассылка {broadcast_id}: до user_id {cursor}, +{len(outcome['sent'])} отправлено, "
+                f"{len(outcome['blocked'])} заблокировали, {len(outcome['error'])} ошибок; "
+                f"{rate:.1f} сообщ./с (в среднем {sent_total / (time.monotonic() - began):.1f})"
+            )
+
+        await self.pool.execute(FINISH_SQL, broadcast_id, self.worker_id)
+        logger.info(f"Рассылка {broadcast_id}: завершена за {time.monotonic() - began:.0f} сек")
+
+    async def run_once(self) -> bool:
+        """Отправить следующую рассылку из очереди; False - очередь пуста"""
+        row = await self.pool.fetchrow(CLAIM_BROADCAST_SQL, self.worker_id, self.claim_ttl)
+        if row is None:
+            return False
+        await self.process(row['id'], row['message'], row['last_user_id'], row['started_at'] is not None)
+        return True
+
+    async def run(self, poll_interval: float) -> None:
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Broadcast worker error: {e}")
+            await asyncio.sleep(poll_interval)
+
+    def start(self, poll_interval: float) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(poll_interval))
+
+    async def stop(self) -> None:
+        """Остановить рассылку; прогресс последней пачки уже сохранен в базе"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -8,8 +8,55 @@ load_dotenv(dotenv_path=env_path)
 
 class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN', '')
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+    # Webhook: публичный адрес (если пусто - webhook в Telegram не регистрируется)
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+    # Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (обязателен в режиме webhook)
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+    # Адрес и порт встроенного HTTP-сервера бота (webhook, прокси файлов, статистика)
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+    # Публичный адрес HTTP-сервера бота для ссылок на фото QR (прокси /files/<file_id>)
+    BOT_PUBLIC_URL = os.getenv('BOT_PUBLIC_URL', '')
+    # Ключ подписи ссылок на файлы (по умолчанию выводится из BOT_TOKEN)
+    FILE_PROXY_SECRET = os.getenv('FILE_PROXY_SECRET', '')
+    # Кеш скачанных из Telegram файлов на диске
+    FILE_CACHE_DIR = os.getenv('FILE_CACHE_DIR', str(Path(__file__).parent / 'data' / 'files'))
+    FILE_CACHE_MAX_BYTES = int(os.getenv('FILE_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+    # Кеш file_id фото казино (загружаются в Telegram один раз)
+    MEDIA_CACHE_PATH = os.getenv('MEDIA_CACHE_PATH', str(Path(__file__).parent / 'data' / 'media_cache.json'))
+    # Служебный чат для предзагрузки фото при запуске (пусто - без предзагрузки)
+    MEDIA_WARMUP_CHAT_ID = os.getenv('MEDIA_WARMUP_CHAT_ID', '')
+    # Токен для GET /stats (если пусто - статистика по HTTP недоступна)
+    STATS_TOKEN = os.getenv('STATS_TOKEN', '')
     # Для API: используем продакшн домен
     API_BASE_URL = os.getenv('API_BASE_URL', 'https://fqxgmrzplndwsyvkeu.ru/api')
+    # Резервный API, если локальный (http://localhost) недоступен
+    API_FALLBACK_URL = os.getenv('API_FALLBACK_URL', 'https://fqxgmrzplndwsyvkeu.ru/api')
+    # Фоновая проверка доступности API (circuit breaker)
+    API_HEALTH_PROBE_PATH = os.getenv('API_HEALTH_PROBE_PATH', '/public/payment-settings')
+    API_HEALTH_PROBE_INTERVAL = float(os.getenv('API_HEALTH_PROBE_INTERVAL', '10'))
+    API_HEALTH_PROBE_TIMEOUT = float(os.getenv('API_HEALTH_PROBE_TIMEOUT', '2'))
+    API_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('API_CIRCUIT_FAILURE_THRESHOLD', '1'))
+    
+    # Пул HTTP-соединений к API (одна сессия на весь процесс бота)
+    API_POOL_LIMIT = int(os.getenv('API_POOL_LIMIT', '100'))
+    API_POOL_LIMIT_PER_HOST = int(os.getenv('API_POOL_LIMIT_PER_HOST', '30'))
+    API_KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', '60'))
+    API_DNS_CACHE_TTL = int(os.getenv('API_DNS_CACHE_TTL', '300'))
+    # Таймауты запросов к API (секунды)
+    API_TIMEOUT = float(os.getenv('API_TIMEOUT', '15'))
+    API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '5'))
+    # Время жизни кеша настроек платежей (секунды)
+    SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', '30'))
+    # Последние полученные настройки на диске: читаются при старте и отдаются, пока API недоступен
+    SETTINGS_SNAPSHOT_PATH = os.getenv('SETTINGS_SNAPSHOT_PATH', str(Path(__file__).parent / 'data' / 'settings.json'))
+    # Подписка на изменения настроек: сколько секунд держать long-poll запрос (0 - выключена)
+    SETTINGS_FEED_WAIT = float(os.getenv('SETTINGS_FEED_WAIT', '25'))
+    # Время жизни кеша активного реквизита (QR собирается локально, см. emv_qr.py)
+    REQUISITE_CACHE_TTL = float(os.getenv('REQUISITE_CACHE_TTL', '30'))
     # Для WebApp: всегда используем HTTPS домен (Telegram требует HTTPS)
     # Для локальной разработки используем продакшн домен
     _payment_site_url = os.getenv('PAYMENT_SITE_URL', 'https://gldwueprxkmbtqsnva.ru')
@@ -23,6 +70,89 @@ class Config:
     else:
         PAYMENT_SITE_URL = _payment_site_url
     
+    # Хранилище FSM: sqlite (по умолчанию), redis или memory
+    FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite').lower()
+    FSM_SQLITE_PATH = os.getenv('FSM_SQLITE_PATH', str(Path(__file__).parent / 'data' / 'fsm.sqlite3'))
+    FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0')
+    # Как часто изменения FSM пишутся в хранилище (секунды)
+    FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', '0.5'))
+    # Время жизни кеша чтения FSM (0 - без перечитывания; >0 для нескольких процессов)
+    FSM_CACHE_TTL = float(os.getenv('FSM_CACHE_TTL', '0'))
+    # Через сколько секунд простоя сбрасывать брошенный диалог (0 - не сбрасывать)
+    FSM_IDLE_TIMEOUTS = {
+        'DepositStates': float(os.getenv('FSM_IDLE_TIMEOUT_DEPOSIT', '1800')),
+        'WithdrawStates': float(os.getenv('FSM_IDLE_TIMEOUT_WITHDRAW', '1800')),
+        'LanguageStates': float(os.getenv('FSM_IDLE_TIMEOUT_LANGUAGE', '600')),
+    }
+    # Данные, которые сохраняются при сбросе диалога
+    FSM_PERSISTENT_KEYS = ('language',)
+    # Через сколько секунд выгружать из памяти записи без активного диалога
+    FSM_MEMORY_IDLE = float(os.getenv('FSM_MEMORY_IDLE', '900'))
+    FSM_EVICTION_INTERVAL = float(os.getenv('FSM_EVICTION_INTERVAL', '60'))
+    
+    # Резерв уникальных сумм пополнения: sqlite (по умолчанию), redis или memory
+    AMOUNT_ALLOCATOR = os.getenv('AMOUNT_ALLOCATOR', 'sqlite').lower()
+    AMOUNT_SQLITE_PATH = os.getenv('AMOUNT_SQLITE_PATH', str(Path(__file__).parent / 'data' / 'amounts.sqlite3'))
+    AMOUNT_REDIS_URL = os.getenv('AMOUNT_REDIS_URL', FSM_REDIS_URL)
+    # Окно оплаты на payment_site: секунды с момента выдачи суммы
+    PAYMENT_WINDOW = float(os.getenv('PAYMENT_WINDOW', '300'))
+    
+    # Сколько обновлений обрабатывается одновременно (обновления одного пользователя - по очереди)
+    UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '64'))
+    # Предел ожидающих обновлений всего и у одного пользователя (лишние отбрасываются, 0 - без предела)
+    UPDATE_QUEUE_LIMIT = int(os.getenv('UPDATE_QUEUE_LIMIT', '1000'))
+    UPDATE_USER_QUEUE_LIMIT = int(os.getenv('UPDATE_USER_QUEUE_LIMIT', '10'))
+    
+    # Ограничение частоты действий одного пользователя: "N/T" - N раз за T секунд
+    # (пусто или 0 - без ограничения); группы задаются флагом throttle у обработчиков
+    THROTTLE_LIMITS = {
+        'start': os.getenv('THROTTLE_START', '5/60'),
+        'deposit': os.getenv('THROTTLE_DEPOSIT', '5/60'),
+        'withdraw': os.getenv('THROTTLE_WITHDRAW', '5/60'),
+        'default': os.getenv('THROTTLE_DEFAULT', '30/10'),
+    }
+    
+    # Лимиты исходящих отправок в Telegram: всего в секунду и на один чат (с запасом)
+    SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '30'))
+    SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+    SEND_CHAT_BURST = float(os.getenv('SEND_CHAT_BURST', '3'))
+    # Сколько раз повторять отправку после RetryAfter
+    SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+    
+    # Очередь заявок в админку (доставка с повторами, см. outbox.py)
+    OUTBOX_PATH = os.getenv('OUTBOX_PATH', str(Path(__file__).parent / 'data' / 'outbox.sqlite3'))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+    OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+    # Задержка повтора: OUTBOX_RETRY_BASE * 2^(попытка - 1), не больше OUTBOX_RETRY_MAX (секунды)
+    OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '2'))
+    OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX', '300'))
+    # После стольких неудачных попыток заявка помечается failed (100 попыток - около 6 часов)
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '100'))
+    
+    # База админки (Postgres) для payment_matcher.py
+    DATABASE_URL = os.getenv('DATABASE_URL', '')
+    # Окно сопоставления платежа и заявки (секунды в обе стороны от даты платежа)
+    MATCHER_WINDOW = float(os.getenv('MATCHER_WINDOW', '1800'))
+    # Сколько секунд сумма занята с момента выдачи: окно оплаты + окно сопоставления,
+    # иначе одна и та же сумма достанется двум заявкам в пределах одного окна
+    AMOUNT_RESERVATION_TTL = float(os.getenv('AMOUNT_RESERVATION_TTL', str(PAYMENT_WINDOW + MATCHER_WINDOW)))
+    MATCHER_POLL_INTERVAL = float(os.getenv('MATCHER_POLL_INTERVAL', '2'))
+    MATCHER_BATCH_SIZE = int(os.getenv('MATCHER_BATCH_SIZE', '1000'))
+    # Как часто перечитывать ожидающие заявки целиком (секунды)
+    MATCHER_RELOAD_INTERVAL = float(os.getenv('MATCHER_RELOAD_INTERVAL', '60'))
+    
+    # Рассылки из админки (broadcast_worker.py, в процессе бота при заданном DATABASE_URL):
+    # отправляются в общем лимите SEND_GLOBAL_RATE после ответов пользователям
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '30'))
+    # Пользователей в пачке; после каждой пачки прогресс сохраняется в базу
+    BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '500'))
+    # Как часто проверять очередь рассылок (секунды, 0 - рассылки этим ботом не отправляются)
+    BROADCAST_POLL_INTERVAL = float(os.getenv('BROADCAST_POLL_INTERVAL', '10'))
+    # Через сколько секунд без прогресса рассылку может продолжить другой экземпляр бота
+    BROADCAST_CLAIM_TTL = float(os.getenv('BROADCAST_CLAIM_TTL', '600'))
+    # Сколько не писать заблокировавшим бота (секунды), потом попробовать снова
+    BROADCAST_BLOCKED_RECHECK = float(os.getenv('BROADCAST_BLOCKED_RECHECK', str(30 * 86400)))
+    
     # Казино (полный список, фильтрация по настройкам из админки)
     CASINOS = [
         {'id': '1xbet', 'name': '1xBet'},
@@ -60,6 +190,9 @@ class Config:
     # Канал и поддержка
     CHANNEL = '@bingokg_news'
     SUPPORT = '@bingokg_boss'
+    # Кеш проверки подписки на канал (секунды): подписан / не подписан
+    SUBSCRIPTION_CACHE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '3600'))
+    SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', '30'))
     
     # Языки
     LANGUAGES = [
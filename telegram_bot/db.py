@@ -0,0 +1,20 @@
+"""Подключение к базе админки (Postgres) для payment_matcher.py и рассылок"""
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg нужен только для работы с базой админки
+    asyncpg = None
+
+
+def _asyncpg_dsn(url: str) -> str:
+    """DATABASE_URL от Prisma -> DSN для asyncpg (без параметра schema)"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != 'schema']
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+async def create_pool(dsn: str, **kwargs):
+    if asyncpg is None:
+        raise RuntimeError('Для работы с базой админки установите пакет asyncpg')
+    return await asyncpg.create_pool(_asyncpg_dsn(dsn), **kwargs)
@@ -0,0 +1,95 @@
+"""Сборка платежного QR (EMV/TLV) локально, без запроса к админке.
+
+Повторяет admin/lib/emv-qr.ts (generate-qr) символ в символ; при изменении
+формата там нужно менять и здесь. Модуль общий для бота и payment_site (сайт
+импортирует его отсюда) и сверяется с эталонами из TS в tests/test_emv_qr.py.
+"""
+import hashlib
+import math
+from typing import Any, Dict, Iterable, Optional
+
+# Ссылки банков на оплату по QR (ключи - как в ответе generate-qr)
+BANK_LINK_TEMPLATES = {
+    'DemirBank': 'https://retail.demirbank.kg/#{}',
+    'O!Money': 'https://api.dengi.o.kg/ru/qr/#{}',
+    'Balance.kg': 'https://balance.kg/#{}',
+    'Bakai': 'https://bakai24.app/#{}',
+    'MegaPay': 'https://megapay.kg/get#{}',
+    'MBank': 'https://app.mbank.kg/qr/#{}',
+}
+
+# id банка -> ключ в BANK_LINK_TEMPLATES
+PRIMARY_BANK_MAP = {
+    'demirbank': 'DemirBank',
+    'omoney': 'O!Money',
+    'balance': 'Balance.kg',
+    'bakai': 'Bakai',
+    'megapay': 'MegaPay',
+    'mbank': 'MBank',
+}
+
+DEFAULT_ENABLED_BANKS = ['demirbank', 'omoney', 'balance', 'bakai', 'megapay', 'mbank']
+
+
+def _js_length(value: str) -> int:
+    """Длина строки, как value.length в JS (в UTF-16, эмодзи - 2)"""
+    return len(value.encode('utf-16-le')) // 2
+
+
+def _tlv(tag: str, value: str) -> str:
+    return f'{tag}{_js_length(value):02d}{value}'
+
+
+def amount_cents(amount: float) -> int:
+    """Сумма в тыйынах, как Math.round(amount * 100) в JS (половина - вверх)"""
+    return int(math.floor(amount * 100 + 0.5))
+
+
+def build_qr_hash(requisite: str, amount: float) -> str:
+    """Полная строка QR: payload + '6304' + последние 4 символа sha256(payload)"""
+    merchant_account = (
+        '0015qr.demirbank.kg'          # Под-тег 00: домен
+        + '01047001'                   # Под-тег 01: короткий тип (7001)
+        + _tlv('10', requisite)        # Под-тег 10: реквизит
+        + '120211130212'               # Под-теги 12, 13: дополнительные поля
+    )
+    payload = (
+        '000201'                                  # 00 - Payload Format Indicator
+        + '010211'                                # 01 - Point of Initiation Method
+        + _tlv('32', merchant_account)            # 32 - Merchant Account
+        + '52044829'                              # 52 - Merchant Category Code
+        + '5303417'                               # 53 - Transaction Currency
+        + _tlv('54', str(amount_cents(amount)).zfill(5))  # 54 - Amount
+        + '5909DEMIRBANK'                         # 59 - Merchant Name
+    )
+    checksum = hashlib.sha256(payload.encode('utf-8')).hexdigest()[-4:]
+    return payload + '6304' + checksum
+
+
+def bank_links(qr_hash: str) -> Dict[str, str]:
+    """Ссылки на оплату во всех банках (и с ключами в нижнем регистре)"""
+    links = {name: template.format(qr_hash) for name, template in BANK_LINK_TEMPLATES.items()}
+    links.update({bank_id: links[name] for bank_id, name in PRIMARY_BANK_MAP.items()})
+    return links
+
+
+def build_qr_response(
+    requisite: str,
+    amount: float,
+    bank: str = 'demirbank',
+    enabled_banks: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """Ответ в формате POST /public/generate-qr"""
+    qr_hash = build_qr_hash(requisite, amount)
+    links = bank_links(qr_hash)
+    primary_bank = PRIMARY_BANK_MAP.get(bank.lower(), 'DemirBank')
+    return {
+        'success': True,
+        'qr_hash': qr_hash,
+        'primary_url': links[primary_bank],
+        'all_bank_urls': links,
+        'settings': {
+            'enabled_banks': list(enabled_banks) if enabled_banks else list(DEFAULT_ENABLED_BANKS),
+            'deposits_enabled': True,
+        },
+    }
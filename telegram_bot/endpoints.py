@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Состояния circuit breaker
+CLOSED = 'closed'  # адрес здоров, запросы идут на него
+OPEN = 'open'      # адрес недоступен, запросы идут мимо до успешной проверки
+
+
+class Endpoint:
+    """Базовый URL API и состояние его circuit breaker"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok: Optional[bool] = None
+
+
+class EndpointPool:
+    """Выбор здорового адреса API по результатам фоновых проверок.
+
+    Адреса перечислены в порядке приоритета. Запросы идут на первый адрес
+    в состоянии closed. Адрес открывается (исключается) после failure_threshold
+    ошибок подряд и возвращается только после успешной фоновой проверки.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        probe_path: str,
+        probe_interval: float,
+        probe_timeout: float,
+        failure_threshold: int = 1,
+    ):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.probe_path = probe_path
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self._task: Optional[asyncio.Task] = None
+        self._started = False
+
+    def _get(self, url: str) -> Optional[Endpoint]:
+        return next((e for e in self.endpoints if e.url == url), None)
+
+    def current(self) -> str:
+        """Адрес для очередного запроса"""
+        for endpoint in self.endpoints:
+            if endpoint.state == CLOSED:
+                return endpoint.url
+        # Все адреса открыты - идем на последний (резервный), а не отказываем сразу
+        return self.endpoints[-1].url
+
+    def has_alternative(self, url: str) -> bool:
+        """Есть ли другой здоровый адрес кроме url"""
+        return any(e.url != url and e.state == CLOSED for e in self.endpoints)
+
+    def record_success(self, url: str) -> None:
+        endpoint = self._get(url)
+        if endpoint is not None:
+            endpoint.failures = 0
+
+    def record_failure(self, url: str) -> None:
+        endpoint = self._get(url)
+        if endpoint is None or len(self.endpoints) == 1:
+            return
+        endpoint.failures += 1
+        if endpoint.state == CLOSED and endpoint.failures >= self.failure_threshold:
+            endpoint.state = OPEN
+            endpoint.opened_at = time.monotonic()
+            logger.warning(f"API {url} недоступен, запросы переключены на {self.current()}")
+
+    async def probe(self, session: aiohttp.ClientSession) -> None:
+        """Проверить все адреса один раз"""
+        if len(self.endpoints) == 1:
+            return
+        await asyncio.gather(*(self._probe_one(session, e) for e in self.endpoints))
+
+    async def _probe_one(self, session: aiohttp.ClientSession, endpoint: Endpoint) -> None:
+        ok = False
+        try:
+            async with session.get(
+                f'{endpoint.url}{self.probe_path}',
+                timeout=aiohttp.ClientTimeout(total=self.probe_timeout)
+            ) as response:
+                ok = response.status < 500
+        except Exception:
+            ok = False
+        endpoint.last_probe_at = time.monotonic()
+        endpoint.last_probe_ok = ok
+        if ok:
+            if endpoint.state == OPEN:
+                logger.info(f"API {endpoint.url} снова доступен")
+            endpoint.state = CLOSED
+            endpoint.failures = 0
+            endpoint.opened_at = None
+        else:
+            self.record_failure(endpoint.url)
+
+    async def start(self, get_session: Callable[[], Awaitable[aiohttp.ClientSession]]) -> None:
+        """Выполнить первую проверку и запустить фоновый цикл проверок"""
+        if len(self.endpoints) == 1 or self._started:
+            return
+        self._started = True
+        await self.probe(await get_session())
+        self._task = asyncio.create_task(self._run(get_session))
+
+    async def _run(self, get_session: Callable[[], Awaitable[aiohttp.ClientSession]]) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self.probe(await get_session())
+            except Exception as e:
+                logger.error(f"Error probing API endpoints: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._started = False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Состояние адресов для мониторинга"""
+        return [
+            {
+                'url': e.url,
+                'state': e.state,
+                'failures': e.failures,
+                'last_probe_ok': e.last_probe_ok,
+            }
+            for e in self.endpoints
+        ]
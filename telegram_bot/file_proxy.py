@@ -0,0 +1,174 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote
+
+from aiohttp import web
+from aiogram import Bot
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _secret() -> bytes:
+    """Ключ подписи ссылок (по умолчанию выводится из токена бота)"""
+    if Config.FILE_PROXY_SECRET:
+        return Config.FILE_PROXY_SECRET.encode()
+    return hashlib.sha256(f'file-proxy:{Config.BOT_TOKEN}'.encode()).digest()
+
+
+def sign(file_id: str) -> str:
+    return hmac.new(_secret(), file_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def file_url(file_id: str) -> str:
+    """Подписанная ссылка на файл Telegram через прокси бота"""
+    return f'{Config.BOT_PUBLIC_URL.rstrip("/")}/files/{quote(file_id, safe="")}?sig={sign(file_id)}'
+
+
+async def download(bot: Bot, file_id: str) -> bytes:
+    """Скачать файл из Telegram по file_id"""
+    file = await bot.get_file(file_id)
+    data = await bot.download_file(file.file_path)
+    # В aiogram 3 download_file возвращает BytesIO
+    if hasattr(data, 'getvalue'):
+        return data.getvalue()
+    if hasattr(data, 'read'):
+        return data.read()
+    return bytes(data)
+
+
+async def receipt_photo_value(bot: Bot, file_id: Optional[str]) -> Optional[str]:
+    """Что передать в API как receipt_photo: ссылку на прокси или (без прокси) base64"""
+    if not file_id:
+        return None
+    if Config.BOT_PUBLIC_URL:
+        return file_url(file_id)
+    # Прокси не настроен - фото нужно передать целиком, как раньше
+    return base64.b64encode(await download(bot, file_id)).decode('utf-8')
+
+
+class DiskLRUCache:
+    """Кеш файлов на диске с ограничением общего размера (вытесняются давно не читанные)"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # имя файла -> размер, от самого старого к самому свежему
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        files = sorted(
+            (p for p in self.directory.iterdir() if p.is_file() and not p.name.endswith('.tmp')),
+            key=lambda p: p.stat().st_mtime
+        )
+        for path in files:
+            self._index[path.name] = path.stat().st_size
+        self._total = sum(self._index.values())
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        name = self._name(key)
+        if name not in self._index:
+            self.misses += 1
+            return None
+        try:
+            data = (self.directory / name).read_bytes()
+        except OSError:
+            self._total -= self._index.pop(name)
+            self.misses += 1
+            return None
+        self._index.move_to_end(name)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        name = self._name(key)
+        path = self.directory / name
+        tmp = path.with_name(name + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self._total -= self._index.pop(name, 0)
+        self._index[name] = len(data)
+        self._total += len(data)
+        while self._total > self.max_bytes and len(self._index) > 1:
+            old_name, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                (self.directory / old_name).unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'files': len(self._index),
+            'bytes': self._total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class FileProxy:
+    """Отдача файлов Telegram (фото QR для вывода) по подписанной ссылке"""
+
+    def __init__(self, bot: Bot, cache: DiskLRUCache):
+        self.bot = bot
+        self.cache = cache
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def _fetch(self, file_id: str) -> bytes:
+        data = await asyncio.to_thread(self.cache.get, file_id)
+        if data is not None:
+            return data
+        data = await download(self.bot, file_id)
+        await asyncio.to_thread(self.cache.put, file_id, data)
+        return data
+
+    async def get(self, file_id: str) -> bytes:
+        """Файл из кеша или из Telegram (одна загрузка на file_id)"""
+        task = self._inflight.get(file_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(file_id))
+            self._inflight[file_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(file_id, None))
+        return await asyncio.shield(task)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        file_id = request.match_info['file_id']
+        if not hmac.compare_digest(request.query.get('sig', ''), sign(file_id)):
+            return web.Response(status=403)
+        etag = f'"{sign(file_id)}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        try:
+            data = await self.get(file_id)
+        except Exception as e:
+            logger.error(f"Error fetching Telegram file {file_id}: {e}")
+            return web.Response(status=404)
+        return web.Response(
+            body=data,
+            content_type='image/jpeg',
+            headers={
+                # Содержимое file_id не меняется
+                'Cache-Control': 'private, max-age=31536000, immutable',
+                'ETag': etag,
+            },
+        )
+
+
+def setup_file_proxy(app: web.Application, bot: Bot) -> FileProxy:
+    """Подключить маршрут GET /files/{file_id} к приложению бота"""
+    proxy = FileProxy(bot, DiskLRUCache(Config.FILE_CACHE_DIR, Config.FILE_CACHE_MAX_BYTES))
+    app.router.add_get('/files/{file_id}', proxy.handle)
+    return proxy
@@ -1,14 +1,15 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from states import DepositStates
 from config import Config
 from api_client import APIClient
 from translations import get_text
+from media_cache import answer_casino_photo
+from keyboards import casino_keyboard, cancel_keyboard
+from amount_allocator import amount_allocator
 import re
 import os
-from pathlib import Path
 
 router = Router()
 
@@ -17,10 +18,9 @@ async def get_lang_from_state(state: FSMContext) -> str:
     data = await state.get_data()
     return data.get('language', 'ru')
 
-@router.message(F.text.in_(['💰 Пополнить', '💰 Толтуруу']))
+@router.message(F.text.in_(['💰 Пополнить', '💰 Толтуруу']), flags={'throttle': 'deposit'})
 async def deposit_start(message: Message, state: FSMContext):
     """Начало процесса пополнения - выбор казино"""
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     lang = await get_lang_from_state(state)
     
     # Получаем настройки из админки
@@ -43,29 +43,10 @@ async def deposit_start(message: Message, state: FSMContext):
         await message.answer(get_text(lang, 'deposit', 'deposits_disabled'))
         return
     
-    enabled_casinos = settings.get('casinos', {})
-    
-    # Фильтруем казино по настройкам (показываем только включенные)
-    # Формируем кнопки по 2 в ряд
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    row = []
-    for casino in Config.CASINOS:
-        # Проверяем, включено ли казино (по умолчанию true, если не указано)
-        casino_id = casino['id']
-        if enabled_casinos.get(casino_id, True):
-            row.append(InlineKeyboardButton(
-                text=casino['name'],
-                callback_data=f'casino_{casino_id}'
-            ))
-            # Когда в ряду 2 кнопки, добавляем ряд в клавиатуру
-            if len(row) == 2:
-                keyboard.inline_keyboard.append(row)
-                row = []  # Создаем новый ряд
-    # Добавляем оставшиеся кнопки (если их меньше 2)
-    if row:
-        keyboard.inline_keyboard.append(row)
-    
-    if not keyboard.inline_keyboard:
+    # Клавиатура с включенными казино (строится один раз на набор настроек)
+    keyboard = casino_keyboard(settings, 'casino_')
+    
+    if keyboard is None:
         await message.answer(get_text(lang, 'deposit', 'no_casinos_available'))
         return
     
@@ -90,22 +71,16 @@ async def deposit_casino_selected(callback: CallbackQuery, state: FSMContext):
     except Exception:
         pass  # Игнорируем ошибки удаления (если сообщение уже удалено или нет прав)
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'deposit', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'deposit')
     
-    # Отправляем фото казино с текстом
-    # Фото находятся в корневой папке проекта
-    photo_path = Path(__file__).parent.parent.parent / f"{casino_id}.jpg"
-    if photo_path.exists():
-        photo = FSInputFile(str(photo_path))
-        await callback.message.answer_photo(
-            photo=photo,
-            caption=get_text(lang, 'deposit', 'enter_account_id', casino=casino_name),
-            reply_markup=keyboard
-        )
-    else:
+    # Отправляем фото казино с текстом (по file_id после первой загрузки)
+    sent = await answer_casino_photo(
+        callback.message,
+        casino_id,
+        caption=get_text(lang, 'deposit', 'enter_account_id', casino=casino_name),
+        reply_markup=keyboard
+    )
+    if not sent:
         # Если фото нет, отправляем только текст
         await callback.message.answer(
             get_text(lang, 'deposit', 'enter_account_id', casino=casino_name),
@@ -135,10 +110,7 @@ async def deposit_account_id_received(message: Message, state: FSMContext):
     
     await state.update_data(account_id=account_id)
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'deposit', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'deposit')
     
     await message.answer(
         get_text(lang, 'deposit', 'enter_amount', min=str(Config.DEPOSIT_MIN), max=str(Config.DEPOSIT_MAX)),
@@ -173,9 +145,9 @@ async def deposit_amount_received(message: Message, state: FSMContext):
         casino_id = data.get('casino_id')
         account_id = data.get('account_id')
         
-        # Добавляем копейки к сумме (случайное число от 1 до 99)
-        import random
-        amount_with_cents = amount + (random.randint(1, 99) / 100)
+        # Добавляем копейки к сумме: сумма уникальна среди ожидающих оплаты,
+        # чтобы поступление однозначно сопоставлялось с заявкой
+        amount_with_cents, pay_until = await amount_allocator.allocate(amount)
         
         # НЕ создаем заявку здесь - она будет создана на форме оплаты при нажатии "Я оплатил"
         # Формируем URL для оплаты с передачей всех необходимых данных
@@ -183,6 +155,8 @@ async def deposit_amount_received(message: Message, state: FSMContext):
         payment_url += f"&user_id={message.from_user.id}"
         payment_url += f"&casino_id={casino_id}"
         payment_url += f"&account_id={account_id}"
+        # Таймер оплаты идет от выдачи суммы, а не от открытия страницы
+        payment_url += f"&expires={int(pay_until)}"
         if message.from_user.username:
             payment_url += f"&username={message.from_user.username}"
         if message.from_user.first_name:
@@ -1,13 +1,24 @@
 from aiogram import Router, F, Bot
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ChatMemberUpdated
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from config import Config
 from translations import get_text
 from api_client import APIClient
+from subscription_cache import SubscriptionCache
+from keyboards import main_menu
 
 router = Router()
 
+# Статусы участника канала, которые считаются подпиской
+SUBSCRIBED_STATUSES = ['member', 'administrator', 'creator']
+
+# Кеш проверок подписки (обновляется событиями chat_member по каналу)
+subscription_cache = SubscriptionCache(
+    positive_ttl=Config.SUBSCRIPTION_CACHE_TTL,
+    negative_ttl=Config.SUBSCRIPTION_NEGATIVE_TTL,
+)
+
 def get_user_lang(state: FSMContext) -> str:
     """Получить язык пользователя (по умолчанию русский)"""
     # В реальном проекте можно сохранять в БД
@@ -21,6 +32,10 @@ async def get_lang_from_state(state: FSMContext) -> str:
 
 async def check_channel_subscription(bot: Bot, user_id: int, channel: str) -> bool:
     """Проверить подписку пользователя на канал"""
+    cached = subscription_cache.get(channel, user_id)
+    if cached is not None:
+        return cached
+    
     try:
         # Убираем @ если есть
         channel_username = channel.lstrip('@')
@@ -31,13 +46,15 @@ async def check_channel_subscription(bot: Bot, user_id: int, channel: str) -> bo
         # Проверяем статус подписки
         # member, administrator, creator - подписан
         # left, kicked - не подписан
-        return chat_member.status in ['member', 'administrator', 'creator']
+        is_subscribed = chat_member.status in SUBSCRIBED_STATUSES
+        subscription_cache.set(channel, user_id, is_subscribed)
+        return is_subscribed
     except Exception as e:
         # Если канал не найден или ошибка, считаем что подписан (чтобы не блокировать бота)
         print(f"Error checking channel subscription: {e}")
         return True
 
-@router.message(Command("start"))
+@router.message(Command("start"), flags={'throttle': 'start'})
 async def cmd_start(message: Message, state: FSMContext, bot: Bot):
     lang = await get_lang_from_state(state)
     
@@ -89,23 +106,9 @@ async def cmd_start(message: Message, state: FSMContext, bot: Bot):
 
 {get_text(lang, 'start', 'support', support=Config.SUPPORT)}"""
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text=get_text(lang, 'menu', 'deposit')),
-                KeyboardButton(text=get_text(lang, 'menu', 'withdraw'))
-            ],
-            [
-                KeyboardButton(text=get_text(lang, 'menu', 'instruction')),
-                KeyboardButton(text=get_text(lang, 'menu', 'language'))
-            ]
-        ],
-        resize_keyboard=True
-    )
-    
-    await message.answer(text, reply_markup=keyboard)
+    await message.answer(text, reply_markup=main_menu(lang))
 
-@router.callback_query(F.data == 'check_subscription')
+@router.callback_query(F.data == 'check_subscription', flags={'throttle': 'start'})
 async def check_subscription_callback(callback: CallbackQuery, state: FSMContext, bot: Bot):
     """Проверка подписки после нажатия кнопки"""
     lang = await get_lang_from_state(state)
@@ -144,21 +147,7 @@ async def check_subscription_callback(callback: CallbackQuery, state: FSMContext
 
 {get_text(lang, 'start', 'support', support=Config.SUPPORT)}"""
         
-        keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [
-                    KeyboardButton(text=get_text(lang, 'menu', 'deposit')),
-                    KeyboardButton(text=get_text(lang, 'menu', 'withdraw'))
-                ],
-                [
-                    KeyboardButton(text=get_text(lang, 'menu', 'instruction')),
-                    KeyboardButton(text=get_text(lang, 'menu', 'language'))
-                ]
-            ],
-            resize_keyboard=True
-        )
-        
-        await callback.message.answer(text, reply_markup=keyboard)
+        await callback.message.answer(text, reply_markup=main_menu(lang))
         await callback.answer()
     else:
         # Еще не подписан
@@ -167,3 +156,14 @@ async def check_subscription_callback(callback: CallbackQuery, state: FSMContext
             show_alert=True
         )
 
+@router.chat_member()
+async def channel_member_updated(event: ChatMemberUpdated):
+    """Подписка/отписка в канале (бот должен быть админом канала) - обновляем кеш"""
+    if not event.chat.username:
+        return
+    subscription_cache.updates += 1
+    subscription_cache.set(
+        event.chat.username,
+        event.new_chat_member.user.id,
+        event.new_chat_member.status in SUBSCRIBED_STATUSES
+    )
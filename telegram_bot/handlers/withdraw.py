@@ -1,14 +1,14 @@
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message, FSInputFile
+from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from states import WithdrawStates
 from config import Config
 from api_client import APIClient
 from translations import get_text
-import base64
-import io
-from pathlib import Path
+from media_cache import answer_casino_photo
+from keyboards import casino_keyboard, cancel_keyboard, withdraw_bank_keyboard
+from file_proxy import receipt_photo_value
+from outbox import request_outbox
 
 router = Router()
 
@@ -17,7 +17,7 @@ async def get_lang_from_state(state: FSMContext) -> str:
     data = await state.get_data()
     return data.get('language', 'ru')
 
-@router.message(F.text.in_(['💸 Вывести', '💸 Чыгаруу']))
+@router.message(F.text.in_(['💸 Вывести', '💸 Чыгаруу']), flags={'throttle': 'withdraw'})
 async def withdraw_start(message: Message, state: FSMContext):
     """Начало процесса вывода - выбор казино"""
     lang = await get_lang_from_state(state)
@@ -42,29 +42,10 @@ async def withdraw_start(message: Message, state: FSMContext):
         await message.answer(get_text(lang, 'withdraw', 'withdrawals_disabled'))
         return
     
-    enabled_casinos = settings.get('casinos', {})
-    
-    # Фильтруем казино по настройкам (показываем только включенные)
-    # Формируем кнопки по 2 в ряд
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    row = []
-    for casino in Config.CASINOS:
-        # Проверяем, включено ли казино (по умолчанию true, если не указано)
-        casino_id = casino['id']
-        if enabled_casinos.get(casino_id, True):
-            row.append(InlineKeyboardButton(
-                text=casino['name'],
-                callback_data=f'withdraw_casino_{casino_id}'
-            ))
-            # Когда в ряду 2 кнопки, добавляем ряд в клавиатуру
-            if len(row) == 2:
-                keyboard.inline_keyboard.append(row)
-                row = []  # Создаем новый ряд
-    # Добавляем оставшиеся кнопки (если их меньше 2)
-    if row:
-        keyboard.inline_keyboard.append(row)
-    
-    if not keyboard.inline_keyboard:
+    # Клавиатура с включенными казино (строится один раз на набор настроек)
+    keyboard = casino_keyboard(settings, 'withdraw_casino_')
+    
+    if keyboard is None:
         await message.answer(get_text(lang, 'withdraw', 'no_casinos_available'))
         return
     
@@ -91,25 +72,9 @@ async def withdraw_casino_selected(callback: CallbackQuery, state: FSMContext):
     
     # Получаем настройки из админки для фильтрации банков
     settings = await APIClient.get_payment_settings()
-    enabled_banks = settings.get('withdrawals', {}).get('banks', [])
-    
-    # Создаем обычную клавиатуру для банков
-    keyboard = ReplyKeyboardMarkup(keyboard=[], resize_keyboard=True)
-    
-    # Создаем кнопки банков по 2 в ряд (только включенные)
-    row = []
-    for bank in Config.WITHDRAW_BANKS:
-        if bank['id'] in enabled_banks:
-            row.append(KeyboardButton(text=bank['name']))
-            if len(row) == 2:
-                keyboard.keyboard.append(row)
-                row = []
-    if row:
-        keyboard.keyboard.append(row)
-    
-    keyboard.keyboard.append([
-        KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))
-    ])
+    
+    # Клавиатура с включенными банками и кнопкой отмены (строится один раз на набор настроек)
+    keyboard = withdraw_bank_keyboard(lang, settings)
     
     await callback.message.answer(
         get_text(lang, 'withdraw', 'select_bank', casino=casino_name),
@@ -144,10 +109,7 @@ async def withdraw_bank_selected(message: Message, state: FSMContext):
     data = await state.get_data()
     casino_name = data.get('casino_name', '')
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'withdraw')
     
     await message.answer(
         get_text(lang, 'withdraw', 'enter_phone', casino=casino_name, bank=bank_name),
@@ -180,10 +142,7 @@ async def withdraw_phone_received(message: Message, state: FSMContext):
     
     await state.update_data(phone=phone)
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'withdraw')
     
     await message.answer(
         get_text(lang, 'withdraw', 'send_qr_photo'),
@@ -197,43 +156,23 @@ async def withdraw_qr_photo_received(message: Message, state: FSMContext):
     # Получаем фото
     photo = message.photo[-1]  # Берем фото наибольшего размера
     
-    # Скачиваем фото и конвертируем в base64
-    file = await message.bot.get_file(photo.file_id)
-    
-    # Получаем байты фото
-    photo_bytes = await message.bot.download_file(file.file_path)
-    # В aiogram 3 download_file возвращает BytesIO
-    if hasattr(photo_bytes, 'getvalue'):
-        photo_data = photo_bytes.getvalue()
-    elif hasattr(photo_bytes, 'read'):
-        photo_data = photo_bytes.read()
-    else:
-        photo_data = bytes(photo_bytes)
-    
-    photo_base64 = base64.b64encode(photo_data).decode('utf-8')
-    
-    await state.update_data(qr_photo=photo_base64)
+    # Храним только file_id: само фото админка загрузит через прокси бота
+    await state.update_data(qr_photo_file_id=photo.file_id)
     
     lang = await get_lang_from_state(state)
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'withdraw')
     
-    # Отправляем фото казино с текстом
+    # Отправляем фото казино с текстом (по file_id после первой загрузки)
     data = await state.get_data()
     casino_id = data.get('casino_id', '')
     casino_name = data.get('casino_name', '')
-    # Фото находятся в корневой папке проекта
-    photo_path = Path(__file__).parent.parent.parent / f"{casino_id}.jpg"
-    if photo_path.exists():
-        photo = FSInputFile(str(photo_path))
-        await message.answer_photo(
-            photo=photo,
-            caption=get_text(lang, 'withdraw', 'enter_account_id', casino=casino_name),
-            reply_markup=keyboard
-        )
-    else:
+    sent = await answer_casino_photo(
+        message,
+        casino_id,
+        caption=get_text(lang, 'withdraw', 'enter_account_id', casino=casino_name),
+        reply_markup=keyboard
+    )
+    if not sent:
         # Если фото нет, отправляем только текст
         await message.answer(
             get_text(lang, 'withdraw', 'enter_account_id', casino=casino_name),
@@ -268,10 +207,7 @@ async def withdraw_account_id_received(message: Message, state: FSMContext):
     
     await state.update_data(account_id=account_id)
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))]],
-        resize_keyboard=True
-    )
+    keyboard = cancel_keyboard(lang, 'withdraw')
     
     await message.answer(
         get_text(lang, 'withdraw', 'enter_code'),
@@ -300,56 +236,41 @@ async def withdraw_code_received(message: Message, state: FSMContext):
     data = await state.get_data()
     
     try:
-        # Создаем заявку на вывод
-        request_data = await APIClient.create_request(
-            telegram_user_id=str(message.from_user.id),
-            request_type='withdraw',
-            amount=0,  # Сумма будет указана позже админом
-            bookmaker=data.get('casino_id'),
-            bank=data.get('bank_id'),
-            phone=data.get('phone'),
-            account_id=data.get('account_id'),
-            telegram_username=message.from_user.username,
-            telegram_first_name=message.from_user.first_name,
-            telegram_last_name=message.from_user.last_name,
-            receipt_photo=data.get('qr_photo'),
-            withdrawal_code=withdrawal_code,
-        )
+        # Ссылка на фото QR через прокси бота (или base64, если прокси не настроен)
+        receipt_photo = await receipt_photo_value(message.bot, data.get('qr_photo_file_id'))
         
-        request_id = request_data.get('data', {}).get('id')
-        
-        if request_id:
-            await message.answer(
-                get_text(lang, 'withdraw', 'request_created',
-                        casino=data.get("casino_name"),
-                        bank=data.get("bank_name"),
-                        phone=data.get("phone"),
-                        account_id=data.get("account_id"))
+        # Заявка на вывод уходит в очередь: доставка в API с повторами,
+        # пользователь получает подтверждение сразу, даже если админка недоступна.
+        # Ключ из id сообщения: повторная обработка того же сообщения не создаст дубль
+        await request_outbox.enqueue(
+            f'withdraw:{message.bot.id}:{message.chat.id}:{message.message_id}',
+            dict(
+                telegram_user_id=str(message.from_user.id),
+                request_type='withdraw',
+                amount=0,  # Сумма будет указана позже админом
+                bookmaker=data.get('casino_id'),
+                bank=data.get('bank_id'),
+                phone=data.get('phone'),
+                account_id=data.get('account_id'),
+                telegram_username=message.from_user.username,
+                telegram_first_name=message.from_user.first_name,
+                telegram_last_name=message.from_user.last_name,
+                receipt_photo=receipt_photo,
+                withdrawal_code=withdrawal_code,
             )
-        else:
-            await message.answer(get_text(lang, 'withdraw', 'error'))
+        )
+        
+        await message.answer(
+            get_text(lang, 'withdraw', 'request_created',
+                    casino=data.get("casino_name"),
+                    bank=data.get("bank_name"),
+                    phone=data.get("phone"),
+                    account_id=data.get("account_id"))
+        )
         
     except Exception as e:
         print(f"Error creating withdraw request: {e}")
-        # Проверяем тип ошибки
-        error_msg = str(e).lower()
-        if 'connection' in error_msg or 'connect' in error_msg or 'refused' in error_msg:
-            if lang == 'ky':
-                await message.answer(
-                    '❌ Сервер жеткиликсиз. Админ панелди 3001 портунда иштеткениңизди текшериңиз.\n\n'
-                    'Админ панелди иштетүү:\n'
-                    'cd admin_nextjs\n'
-                    'npm run dev'
-                )
-            else:
-                await message.answer(
-                    '❌ Сервер недоступен. Пожалуйста, убедитесь, что админ-панель запущена на порту 3001.\n\n'
-                    'Запустите админ-панель:\n'
-                    'cd admin_nextjs\n'
-                    'npm run dev'
-                )
-        else:
-            await message.answer(get_text(lang, 'withdraw', 'error'))
+        await message.answer(get_text(lang, 'withdraw', 'error'))
     
     await state.clear()
     
@@ -0,0 +1,111 @@
+"""Готовые клавиатуры бота.
+
+Разметка строится один раз на (язык, отпечаток настроек, версия переводов)
+и дальше переиспользуется: хендлеры не собирают кнопки на каждый запрос.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from config import Config
+from translations import TRANSLATIONS_VERSION, get_text
+
+
+def _rows(buttons: list, size: int = 2) -> list:
+    """Разбить кнопки на ряды по size штук"""
+    return [buttons[i:i + size] for i in range(0, len(buttons), size)]
+
+
+def _enabled_casinos(settings: Dict[str, Any]) -> Tuple[str, ...]:
+    """Отпечаток настроек казино: id включенных (по умолчанию казино включено)"""
+    enabled = settings.get('casinos', {})
+    return tuple(c['id'] for c in Config.CASINOS if enabled.get(c['id'], True))
+
+
+def _enabled_withdraw_banks(settings: Dict[str, Any]) -> Tuple[str, ...]:
+    """Отпечаток настроек выводов: id включенных банков"""
+    enabled = settings.get('withdrawals', {}).get('banks', [])
+    return tuple(b['id'] for b in Config.WITHDRAW_BANKS if b['id'] in enabled)
+
+
+@lru_cache(maxsize=16)
+def _main_menu(lang: str, version: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [
+                KeyboardButton(text=get_text(lang, 'menu', 'deposit')),
+                KeyboardButton(text=get_text(lang, 'menu', 'withdraw'))
+            ],
+            [
+                KeyboardButton(text=get_text(lang, 'menu', 'instruction')),
+                KeyboardButton(text=get_text(lang, 'menu', 'language'))
+            ]
+        ],
+        resize_keyboard=True
+    )
+
+
+def main_menu(lang: str) -> ReplyKeyboardMarkup:
+    """Главное меню"""
+    return _main_menu(lang, TRANSLATIONS_VERSION)
+
+
+@lru_cache(maxsize=16)
+def _cancel_keyboard(lang: str, section: str, version: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=get_text(lang, section, 'cancel'))]],
+        resize_keyboard=True
+    )
+
+
+def cancel_keyboard(lang: str, section: str) -> ReplyKeyboardMarkup:
+    """Клавиатура с одной кнопкой отмены (section: deposit или withdraw)"""
+    return _cancel_keyboard(lang, section, TRANSLATIONS_VERSION)
+
+
+@lru_cache(maxsize=64)
+def _casino_keyboard(prefix: str, casino_ids: Tuple[str, ...]) -> Optional[InlineKeyboardMarkup]:
+    names = {c['id']: c['name'] for c in Config.CASINOS}
+    buttons = [
+        InlineKeyboardButton(text=names[casino_id], callback_data=f'{prefix}{casino_id}')
+        for casino_id in casino_ids
+    ]
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=_rows(buttons))
+
+
+def casino_keyboard(settings: Dict[str, Any], prefix: str) -> Optional[InlineKeyboardMarkup]:
+    """Выбор казино (только включенные, по 2 в ряд); None - нет доступных казино"""
+    return _casino_keyboard(prefix, _enabled_casinos(settings))
+
+
+@lru_cache(maxsize=64)
+def _withdraw_bank_keyboard(lang: str, bank_ids: Tuple[str, ...], version: str) -> ReplyKeyboardMarkup:
+    names = {b['id']: b['name'] for b in Config.WITHDRAW_BANKS}
+    buttons = [KeyboardButton(text=names[bank_id]) for bank_id in bank_ids]
+    keyboard = _rows(buttons)
+    keyboard.append([KeyboardButton(text=get_text(lang, 'withdraw', 'cancel'))])
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+
+def withdraw_bank_keyboard(lang: str, settings: Dict[str, Any]) -> ReplyKeyboardMarkup:
+    """Выбор банка для вывода (только включенные, по 2 в ряд) и кнопка отмены"""
+    return _withdraw_bank_keyboard(lang, _enabled_withdraw_banks(settings), TRANSLATIONS_VERSION)
+
+
+@lru_cache(maxsize=1)
+def language_keyboard() -> InlineKeyboardMarkup:
+    """Выбор языка"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=language['name'], callback_data=f'lang_{language["code"]}')]
+        for language in Config.LANGUAGES
+    ])
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Попадания/промахи кеша клавиатур"""
+    return {
+        fn.__name__.lstrip('_'): fn.cache_info()._asdict()
+        for fn in (_main_menu, _cancel_keyboard, _casino_keyboard, _withdraw_bank_keyboard)
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Фото казино находятся в корневой папке проекта
+PHOTOS_DIR = Path(__file__).parent.parent
+
+
+def casino_photo_path(casino_id: str) -> Path:
+    return PHOTOS_DIR / f"{casino_id}.jpg"
+
+
+class PhotoIdCache:
+    """Постоянный кеш file_id загруженных в Telegram фото.
+
+    Ключ - бот, путь и mtime файла: если картинку заменили на диске,
+    она будет загружена заново.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._bot_id = Config.BOT_TOKEN.split(':', 1)[0]
+        self._ids: Dict[str, str] = {}
+        try:
+            self._ids = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            pass
+
+    def _key(self, photo_path: Path) -> Optional[str]:
+        try:
+            mtime = photo_path.stat().st_mtime_ns
+        except OSError:
+            return None
+        return f'{self._bot_id}:{photo_path.resolve()}:{mtime}'
+
+    def get(self, photo_path: Path) -> Optional[str]:
+        key = self._key(photo_path)
+        return self._ids.get(key) if key else None
+
+    def put(self, photo_path: Path, file_id: str) -> None:
+        key = self._key(photo_path)
+        if key is None:
+            return
+        # Старые записи для этого файла (другой mtime) больше не нужны
+        prefix = key.rsplit(':', 1)[0] + ':'
+        self._ids = {k: v for k, v in self._ids.items() if not k.startswith(prefix)}
+        self._ids[key] = file_id
+        self._save()
+
+    def drop(self, photo_path: Path) -> None:
+        key = self._key(photo_path)
+        if key and self._ids.pop(key, None) is not None:
+            self._save()
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            tmp.write_text(json.dumps(self._ids, ensure_ascii=False, indent=2), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f"Error saving media cache: {e}")
+
+
+photo_cache = PhotoIdCache(Config.MEDIA_CACHE_PATH)
+
+
+async def answer_casino_photo(message: Message, casino_id: str, **kwargs) -> bool:
+    """Ответить фото казино (по file_id, если оно уже загружено). False - фото нет"""
+    path = casino_photo_path(casino_id)
+    file_id = photo_cache.get(path)
+    if file_id:
+        try:
+            await message.answer_photo(photo=file_id, **kwargs)
+            return True
+        except TelegramBadRequest:
+            # file_id стал недействительным - загрузим файл заново
+            photo_cache.drop(path)
+    if not path.exists():
+        return False
+    sent = await message.answer_photo(photo=FSInputFile(str(path)), **kwargs)
+    photo_cache.put(path, sent.photo[-1].file_id)
+    return True
+
+
+async def warm_up(bot: Bot, chat_id: int) -> None:
+    """Заранее загрузить фото всех казино в служебный чат и запомнить file_id"""
+    for casino in Config.CASINOS:
+        path = casino_photo_path(casino['id'])
+        if not path.exists() or photo_cache.get(path):
+            continue
+        try:
+            sent = await bot.send_photo(chat_id, FSInputFile(str(path)), disable_notification=True)
+            photo_cache.put(path, sent.photo[-1].file_id)
+            await bot.delete_message(chat_id, sent.message_id)
+        except Exception as e:
+            logger.error(f"Error warming up photo {path.name}: {e}")
+        # Не упираемся в лимит Telegram на отправку в один чат
+        await asyncio.sleep(1)
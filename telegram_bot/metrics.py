@@ -0,0 +1,9 @@
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], p: float, scale: float = 1.0) -> float:
+    """Перцентиль p (0..1) отсортированной выборки, умноженный на scale (1000 - в мс);
+    p = 1.0 - максимум, пустая выборка - 0.0"""
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(len(values) * p))] * scale, 3)
@@ -0,0 +1,224 @@
+import asyncio
+import bisect
+import contextvars
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+INTERACTIVE = 0
+BULK = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('send_priority', default=INTERACTIVE)
+
+# Методы, которые расходуют лимиты Telegram на отправку (SendMessage, SendPhoto,
+# CopyMessage, EditMessageText, ...); остальные идут напрямую
+SENDING_METHOD_PREFIXES = ('Send', 'Copy', 'Forward', 'Edit')
+
+# Границы корзин гистограмм, миллисекунды (последняя - все, что больше)
+HISTOGRAM_BOUNDS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@contextmanager
+def bulk_sends():
+    """Отправки внутри блока идут с низким приоритетом (рассылки):
+
+        with bulk_sends():
+            await bot.send_message(...)
+    """
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'sum_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f'le_{bound}' for bound in HISTOGRAM_BOUNDS_MS] + ['inf']
+        return {
+            'count': self.total,
+            'avg_ms': round(self.sum_ms / self.total, 3) if self.total else 0.0,
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class _Bucket:
+    """Token bucket; blocked_until - пауза после RetryAfter"""
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, burst: float):
+        self.capacity = burst
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 - сейчас)"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class OutboundSender(BaseRequestMiddleware):
+    """Очередь исходящих запросов к Telegram с приоритетами и лимитами.
+
+    Отправки (сообщения, фото, правки) и ответы на нажатия кнопок получают
+    разрешение от планировщика: сначала интерактивные ответы, потом рассылки
+    (bulk_sends), в пределах общего лимита и лимита на чат. На RetryAfter чат
+    (или все отправки, если чата нет) ставится на паузу, и запрос повторяется.
+    Остальные методы (getUpdates, getChatMember, getFile, ...) идут напрямую.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = _Bucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: Dict[Any, _Bucket] = {}
+        # Ожидающие: (приоритет, порядковый номер, chat_id, future), по возрастанию
+        self._waiters: List[Tuple[int, int, Any, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.latency: Dict[str, Histogram] = {}
+        self.queue_time = {INTERACTIVE: Histogram(), BULK: Histogram()}
+        self.retry_after = 0
+
+    def _chat_bucket(self, chat_id: Any) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # Полные ведра без паузы ничем не отличаются от новых
+                now = time.monotonic()
+                self._chats = {
+                    k: b for k, b in self._chats.items()
+                    if b.blocked_until > now or b.tokens + (now - b.updated) * b.rate < b.capacity
+                }
+            bucket = self._chats[chat_id] = _Bucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _acquire(self, priority: int, chat_id: Any) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._schedule())
+        future = asyncio.get_running_loop().create_future()
+        bisect.insort(self._waiters, (priority, next(self._seq), chat_id, future), key=lambda w: w[:2])
+        self._wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._waiters = [w for w in self._waiters if w[3] is not future]
+            raise
+
+    async def _schedule(self) -> None:
+        """Выдает разрешения на отправку по приоритету, пока есть ожидающие"""
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = time.monotonic()
+            wait = self.global_bucket.ready_in(now)
+            if wait == 0:
+                # Первый по приоритету, чей чат не упирается в свой лимит
+                wait = float('inf')
+                for index, (_, _, chat_id, future) in enumerate(self._waiters):
+                    chat = self._chat_bucket(chat_id) if chat_id is not None else None
+                    chat_wait = chat.ready_in(now) if chat is not None else 0.0
+                    if chat_wait == 0:
+                        del self._waiters[index]
+                        self.global_bucket.take()
+                        if chat is not None:
+                            chat.take()
+                        if not future.done():
+                            future.set_result(None)
+                        wait = 0.0
+                        break
+                    wait = min(wait, chat_wait)
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        if not (name.startswith(SENDING_METHOD_PREFIXES) or isinstance(method, AnswerCallbackQuery)):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        priority = _priority.get()
+        for attempt in range(self.max_retries + 1):
+            enqueued = time.monotonic()
+            await self._acquire(priority, chat_id)
+            started = time.monotonic()
+            self.queue_time[priority].observe(started - enqueued)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                pause_until = time.monotonic() + e.retry_after
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+                bucket.blocked_until = max(bucket.blocked_until, pause_until)
+                logger.warning(f"Flood control: {name} chat={chat_id}, пауза {e.retry_after} сек")
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                self.latency.setdefault(name, Histogram()).observe(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': len(self._waiters),
+            'retry_after': self.retry_after,
+            'queue_time': {
+                'interactive': self.queue_time[INTERACTIVE].snapshot(),
+                'bulk': self.queue_time[BULK].snapshot(),
+            },
+            'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+        }
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from api_client import APIClient
+from config import Config
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+# (ключ, данные заявки, время постановки, число попыток)
+Entry = Tuple[str, Dict[str, Any], float, int]
+
+
+class RequestOutbox:
+    """Надежная очередь заявок в админку (SQLite на диске).
+
+    Заявка сначала записывается в файл с ключом идемпотентности, пользователь
+    сразу получает подтверждение, а фоновая задача доставляет заявки в API.
+    При недоступности API (сеть, таймаут, 5xx) доставка повторяется с
+    экспоненциальной задержкой; повтор не создаст дубль - API узнает ключ.
+    Ответ 4xx повторять бессмысленно: такая заявка помечается failed, как и
+    заявка, не доставленная за max_attempts попыток.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 20,
+        poll_interval: float = 5.0,
+        retry_base: float = 2.0,
+        retry_max: float = 300.0,
+        max_attempts: int = 100,
+        latency_samples: int = 1000,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                ' key TEXT PRIMARY KEY,'
+                ' payload TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' created_at REAL NOT NULL,'
+                ' next_attempt_at REAL NOT NULL,'
+                ' delivered_at REAL,'
+                ' last_error TEXT)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)'
+            )
+            self._conn.commit()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._latencies = deque(maxlen=latency_samples)
+        self.depth = self._count(PENDING)
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT count(*) FROM outbox WHERE status = ?', (status,)).fetchone()[0]
+
+    def _insert(self, key: str, payload: Dict[str, Any]) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO outbox (key, payload, status, created_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(payload, ensure_ascii=False), PENDING, now, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def _due(self, limit: int) -> List[Entry]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, payload, created_at, attempts FROM outbox '
+                'WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?',
+                (PENDING, time.time(), limit)
+            ).fetchall()
+        return [(key, json.loads(payload), created_at, attempts) for key, payload, created_at, attempts in rows]
+
+    def _save_results(self, updates: List[Tuple[str, int, float, Optional[str], str]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, '
+                'delivered_at = CASE WHEN ? = \'delivered\' THEN ? ELSE delivered_at END WHERE key = ?',
+                [(status, attempts, next_at, error, status, now, key)
+                 for key, attempts, next_at, error, status in updates]
+            )
+            self._conn.commit()
+
+    async def enqueue(self, key: str, payload: Dict[str, Any]) -> None:
+        """Записать заявку в очередь (ключ уже был - повторно не ставится)"""
+        if await asyncio.to_thread(self._insert, key, payload):
+            self.depth += 1
+        self._wakeup.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _retry(self, key: str, attempts: int, error: str) -> Tuple[str, int, float, Optional[str], str]:
+        if attempts >= self.max_attempts:
+            logger.error(f"Outbox: заявка {key} не доставлена за {attempts} попыток: {error}")
+            self.failed += 1
+            return key, attempts, 0.0, error, FAILED
+        self.retries += 1
+        return key, attempts, time.time() + self._backoff(attempts), error, PENDING
+
+    async def _deliver(self, entry: Entry) -> Tuple[str, int, float, Optional[str], str]:
+        key, payload, created_at, attempts = entry
+        attempts += 1
+        try:
+            result = await APIClient.create_request(**payload, idempotency_key=key)
+        except aiohttp.ClientResponseError as e:
+            # В том числе 4xx с телом не в JSON (ContentTypeError)
+            if 400 <= e.status < 500:
+                logger.error(f"Outbox: заявка {key} отклонена API: {e.status} {e.message}")
+                self.failed += 1
+                return key, attempts, 0.0, f'{e.status} {e.message}', FAILED
+            return self._retry(key, attempts, f'{e.status} {e.message}')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # API недоступен - повторим позже
+            return self._retry(key, attempts, str(e) or type(e).__name__)
+        except Exception as e:
+            # Неожиданная ошибка (например, битый JSON) - не теряем остальную пачку
+            logger.exception(f"Outbox: ошибка доставки заявки {key}")
+            return self._retry(key, attempts, f'{type(e).__name__}: {e}')
+        if result.get('success') is False or not result.get('data', {}).get('id'):
+            logger.error(f"Outbox: заявка {key} отклонена API: {result.get('error')}")
+            self.failed += 1
+            return key, attempts, 0.0, str(result.get('error')), FAILED
+        self.delivered += 1
+        self._latencies.append(time.time() - created_at)
+        return key, attempts, 0.0, None, DELIVERED
+
+    async def flush(self) -> int:
+        """Отправить одну пачку готовых к доставке заявок; вернуть их число"""
+        entries = await asyncio.to_thread(self._due, self.batch_size)
+        if not entries:
+            return 0
+        # Заявки пачки уходят параллельно по пулу соединений APIClient;
+        # _deliver сам превращает ошибки в повтор или failed
+        updates = await asyncio.gather(*(self._deliver(entry) for entry in entries))
+        await asyncio.to_thread(self._save_results, updates)
+        self.depth -= sum(1 for update in updates if update[4] != PENDING)
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Полная пачка - возможно, есть еще: сразу берем следующую
+                while await self.flush() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox flush error: {e}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить доставку; недоставленные заявки остаются в файле до следующего запуска"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            'depth': self.depth,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retries': self.retries,
+            'delivery_latency_s_p50': percentile(latencies, 0.5),
+            'delivery_latency_s_p99': percentile(latencies, 0.99),
+            'delivery_latency_s_max': percentile(latencies, 1.0),
+        }
+
+
+request_outbox = RequestOutbox(
+    Config.OUTBOX_PATH,
+    batch_size=Config.OUTBOX_BATCH_SIZE,
+    poll_interval=Config.OUTBOX_POLL_INTERVAL,
+    retry_base=Config.OUTBOX_RETRY_BASE,
+    retry_max=Config.OUTBOX_RETRY_MAX,
+    max_attempts=Config.OUTBOX_MAX_ATTEMPTS,
+)
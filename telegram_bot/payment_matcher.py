@@ -0,0 +1,303 @@
+"""Сопоставление входящих платежей (IncomingPayment) с заявками на пополнение.
+
+Отдельный процесс: python payment_matcher.py
+Работает напрямую с базой админки (DATABASE_URL, Postgres).
+
+Ожидающие пополнения держатся в памяти в хеш-индексе по (сумма в тыйынах, банк),
+поэтому каждый платеж сопоставляется за O(1). Найденные пары записываются пачкой
+в одной транзакции: платеж получает request_id и is_processed = true.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from db import create_pool
+
+logger = logging.getLogger(__name__)
+
+# Названия банков в уведомлениях -> id банка в заявках
+BANK_ALIASES = {
+    'odengi': 'omoney',
+    'omoney': 'omoney',
+    'оденьги': 'omoney',
+    'oденьги': 'omoney',  # латинская "O" в "O!Деньги"
+    'demirbank': 'demir',
+    'demir': 'demir',
+    'mbank': 'mbank',
+    'bakai': 'bakai',
+    'bakaibank': 'bakai',
+    'megapay': 'megapay',
+    'balance': 'balance',
+    'balancekg': 'balance',
+    'optima': 'optima',
+    'optimabank': 'optima',
+    'kompanion': 'kompanion',
+}
+
+
+def normalize_bank(bank: Optional[str]) -> Optional[str]:
+    """id банка по названию (None - банк неизвестен, сопоставляем только по сумме)"""
+    if not bank:
+        return None
+    return BANK_ALIASES.get(re.sub(r'[^0-9a-zа-я]', '', bank.lower()))
+
+
+def to_cents(amount) -> int:
+    """Точная сумма в тыйынах (Decimal из базы без ошибок округления float)"""
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+@dataclass
+class PendingDeposit:
+    id: int
+    cents: int
+    bank: Optional[str]
+    created_at: datetime
+
+
+@dataclass
+class IncomingPayment:
+    id: int
+    cents: int
+    bank: Optional[str]
+    payment_date: datetime
+
+
+class MatchIndex:
+    """Хеш-индекс ожидающих пополнений: (сумма, банк) -> заявки по времени создания.
+
+    Каждая заявка попадает в два списка: по (сумма, банк) и по (сумма, None) -
+    второй нужен для платежей, у которых банк не распознан.
+    Если подходят несколько заявок, берется самая ранняя по (created_at, id):
+    результат не зависит от порядка загрузки.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        self._buckets: Dict[Tuple[int, Optional[str]], List[PendingDeposit]] = defaultdict(list)
+        self._ids: Dict[int, PendingDeposit] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, deposit: PendingDeposit) -> None:
+        if deposit.id in self._ids:
+            return
+        self._ids[deposit.id] = deposit
+        keys = {(deposit.cents, deposit.bank), (deposit.cents, None)}
+        for key in keys:
+            bucket = self._buckets[key]
+            bucket.append(deposit)
+            if len(bucket) > 1 and (bucket[-2].created_at, bucket[-2].id) > (deposit.created_at, deposit.id):
+                bucket.sort(key=lambda d: (d.created_at, d.id))
+
+    def remove(self, deposit_id: int) -> None:
+        deposit = self._ids.pop(deposit_id, None)
+        if deposit is None:
+            return
+        for key in {(deposit.cents, deposit.bank), (deposit.cents, None)}:
+            bucket = self._buckets[key]
+            bucket.remove(deposit)
+            if not bucket:
+                del self._buckets[key]
+
+    def _first_in_window(self, key, payment: IncomingPayment, any_bank: bool) -> Optional[PendingDeposit]:
+        earliest = payment.payment_date - self.window
+        latest = payment.payment_date + self.window
+        for deposit in self._buckets.get(key, ()):
+            if deposit.created_at > latest:
+                break
+            if deposit.created_at >= earliest and (any_bank or deposit.bank is None):
+                return deposit
+        return None
+
+    def match(self, payment: IncomingPayment) -> Optional[PendingDeposit]:
+        """Заявка для платежа (и удаление ее из индекса) или None"""
+        deposit = self._first_in_window((payment.cents, payment.bank), payment, any_bank=True)
+        if deposit is None and payment.bank is not None:
+            # Заявка без банка подходит платежу из любого банка
+            deposit = self._first_in_window((payment.cents, None), payment, any_bank=False)
+        if deposit is not None:
+            self.remove(deposit.id)
+        return deposit
+
+
+PENDING_SQL = '''
+    SELECT r.id, r.amount, r.bank, r.created_at
+    FROM requests r
+    WHERE r.request_type = 'deposit' AND r.status = 'pending'
+      AND r.amount IS NOT NULL AND r.created_at >= $1 AND r.id > $2
+      AND NOT EXISTS (SELECT 1 FROM incoming_payments p WHERE p.request_id = r.id)
+    ORDER BY r.id
+'''
+
+PAYMENTS_SQL = '''
+    SELECT id, amount, bank, payment_date
+    FROM incoming_payments
+    WHERE is_processed = false AND request_id IS NULL AND payment_date >= $1 AND id > $2
+    ORDER BY id
+    LIMIT $3
+'''
+
+# Заявка остается в 'pending' (зачисление в казино делает оператор),
+# но помечается status_detail, чтобы было видно, что платеж по ней найден
+LINK_SQL = '''
+    WITH linked AS (
+        UPDATE incoming_payments AS p
+        SET request_id = m.request_id, is_processed = true, updated_at = now()
+        FROM unnest($1::int[], $2::int[]) AS m(payment_id, request_id)
+        WHERE p.id = m.payment_id AND p.request_id IS NULL
+        RETURNING p.request_id
+    ), marked AS (
+        UPDATE requests AS r
+        SET status_detail = 'payment_matched', updated_at = now()
+        FROM linked
+        WHERE r.id = linked.request_id AND r.status = 'pending'
+        RETURNING r.id
+    )
+    SELECT count(*) FROM linked
+'''
+
+
+class PaymentMatcher:
+    """Фоновый цикл: новые заявки -> индекс, новые платежи -> пары -> пачка в базу.
+
+    Платеж может прийти раньше, чем пользователь нажмет "Я оплатил" и заявка
+    появится в базе, поэтому несопоставленные платежи ждут в памяти до конца окна.
+    """
+
+    def __init__(self, pool, window: float, batch_size: int, reload_interval: float):
+        self.pool = pool
+        self.index = MatchIndex(timedelta(seconds=window))
+        self.batch_size = batch_size
+        self.reload_interval = reload_interval
+        self._payments: Dict[int, IncomingPayment] = {}
+        self._last_request_id = 0
+        self._last_payment_id = 0
+        self._reloaded_at = 0.0
+        self.matched = 0
+        self.batches = 0
+
+    async def load(self) -> None:
+        """Добавить новые заявки в индекс и новые платежи в очередь.
+
+        Периодически все перечитывается заново: так уходят заявки, которые отменили,
+        и платежи, которые связали с заявкой вручную.
+        """
+        if time.monotonic() - self._reloaded_at >= self.reload_interval:
+            self.index = MatchIndex(self.index.window)
+            self._payments = {}
+            self._last_request_id = 0
+            self._last_payment_id = 0
+            self._reloaded_at = time.monotonic()
+        now = datetime.utcnow()
+        for row in await self.pool.fetch(PENDING_SQL, now - self.index.window * 2, self._last_request_id):
+            self.index.add(PendingDeposit(
+                id=row['id'],
+                cents=to_cents(row['amount']),
+                bank=normalize_bank(row['bank']),
+                created_at=row['created_at'],
+            ))
+            self._last_request_id = max(self._last_request_id, row['id'])
+        rows = await self.pool.fetch(PAYMENTS_SQL, now - self.index.window, self._last_payment_id, self.batch_size)
+        for row in rows:
+            self._payments[row['id']] = IncomingPayment(
+                id=row['id'],
+                cents=to_cents(row['amount']),
+                bank=normalize_bank(row['bank']),
+                payment_date=row['payment_date'],
+            )
+            self._last_payment_id = max(self._last_payment_id, row['id'])
+
+    def match_payments(self) -> List[Tuple[IncomingPayment, PendingDeposit]]:
+        """Пары (платеж, заявка); платежи идут по (payment_date, id)"""
+        expired = datetime.utcnow() - self.index.window
+        pairs = []
+        for payment in sorted(self._payments.values(), key=lambda p: (p.payment_date, p.id)):
+            deposit = self.index.match(payment)
+            if deposit is not None:
+                pairs.append((payment, deposit))
+            if deposit is not None or payment.payment_date < expired:
+                del self._payments[payment.id]
+        return pairs
+
+    def restore(self, pairs: List[Tuple[IncomingPayment, PendingDeposit]]) -> None:
+        """Вернуть в память пары, которые не удалось записать (сопоставятся в следующий проход)"""
+        for payment, deposit in pairs:
+            self.index.add(deposit)
+            self._payments[payment.id] = payment
+
+    async def write(self, pairs: List[Tuple[int, int]]) -> int:
+        """Записать пары одной транзакцией; вернуть число связанных платежей"""
+        if not pairs:
+            return 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                linked = await conn.fetchval(
+                    LINK_SQL, [p for p, _ in pairs], [r for _, r in pairs]
+                )
+        self.batches += 1
+        self.matched += linked
+        return linked
+
+    async def run_once(self) -> int:
+        """Один проход: вернуть число связанных платежей"""
+        await self.load()
+        pairs = self.match_payments()
+        try:
+            return await self.write([(payment.id, deposit.id) for payment, deposit in pairs])
+        except BaseException:
+            # Пары уже убраны из памяти, а в базе их нет - иначе потеряются до перезагрузки
+            self.restore(pairs)
+            raise
+
+    async def run(self, poll_interval: float) -> None:
+        while True:
+            try:
+                linked = await self.run_once()
+                if linked:
+                    logger.info(f"Сопоставлено платежей: {linked}")
+            except Exception as e:
+                logger.error(f"Error matching payments: {e}")
+            await asyncio.sleep(poll_interval)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending_deposits': len(self.index),
+            'waiting_payments': len(self._payments),
+            'matched': self.matched,
+            'batches': self.batches,
+        }
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    if not Config.DATABASE_URL:
+        logger.error("DATABASE_URL не установлен!")
+        return
+    pool = await create_pool(Config.DATABASE_URL, min_size=1, max_size=2)
+    matcher = PaymentMatcher(
+        pool,
+        window=Config.MATCHER_WINDOW,
+        batch_size=Config.MATCHER_BATCH_SIZE,
+        reload_interval=Config.MATCHER_RELOAD_INTERVAL,
+    )
+    logger.info("Сопоставление платежей запущено")
+    try:
+        await matcher.run(Config.MATCHER_POLL_INTERVAL)
+    finally:
+        await pool.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Сопоставление платежей остановлено")
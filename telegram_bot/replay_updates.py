@@ -0,0 +1,42 @@
+"""Отправка записанных обновлений Telegram в локальный webhook-сервер бота.
+
+Использование:
+    python replay_updates.py updates.jsonl [--url http://127.0.0.1:8080/webhook]
+
+Файл - JSON-массив обновлений или по одному обновлению в строке (JSONL).
+Секрет берется из WEBHOOK_SECRET (.env).
+"""
+import argparse
+import asyncio
+import json
+import aiohttp
+from config import Config
+
+
+def load_updates(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+async def replay(path: str, url: str) -> None:
+    updates = load_updates(path)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': Config.WEBHOOK_SECRET}
+    async with aiohttp.ClientSession() as session:
+        for update in updates:
+            async with session.post(url, json=update, headers=headers) as response:
+                print(f"update_id={update.get('update_id')}: HTTP {response.status}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Отправить записанные обновления в webhook бота')
+    parser.add_argument('path', help='JSON или JSONL файл с обновлениями')
+    parser.add_argument(
+        '--url',
+        default=f'http://127.0.0.1:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}',
+        help='адрес webhook-сервера бота'
+    )
+    args = parser.parse_args()
+    asyncio.run(replay(args.path, args.url))
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SettingsCache:
+    """Кеш настроек платежей в памяти процесса.
+
+    Пока значение свежее (моложе ttl) - отдаем его без запроса к API.
+    Когда устарело - отдаем старое значение и запускаем одно фоновое обновление.
+    Одновременные промахи (пустой кеш) ждут один общий запрос к API.
+
+    С snapshot_path последние полученные настройки сохраняются на диск и читаются
+    при создании кеша: первый запрос после старта обслуживается без API. Значение
+    из файла (и прежнее значение, пока API недоступен) отдается с ключом
+    'stale': True; первый успешный ответ API этот флаг снимает.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: float,
+        snapshot_path: Optional[str] = None,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self._value: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._saved: Optional[Dict[str, Any]] = None
+        self.snapshot_saved_at: Optional[float] = None
+        # Счетчики для мониторинга
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        if snapshot_path:
+            self._load_snapshot()
+
+    async def get(self) -> Dict[str, Any]:
+        """Получить настройки (из кеша, если есть)"""
+        if self._value is not None:
+            if time.monotonic() - self._fetched_at < self.ttl:
+                self.hits += 1
+            else:
+                # Устаревшее значение отдаем сразу, обновляем в фоне
+                self.stale_hits += 1
+                self._ensure_refresh()
+            return self._value
+
+        self.misses += 1
+        # shield: отмена одного ожидающего хендлера не отменяет общий запрос
+        return await asyncio.shield(self._ensure_refresh())
+
+    def set(self, value: Dict[str, Any]) -> None:
+        """Положить в кеш уже полученные настройки"""
+        self._value = value
+        self._fetched_at = time.monotonic()
+        self._save_snapshot(value)
+
+    def touch(self) -> None:
+        """Подтвердить, что значение в кеше актуально (продлить ttl)"""
+        if self._value is not None:
+            if self._value.get('stale'):
+                self.set({k: v for k, v in self._value.items() if k != 'stale'})
+            self._fetched_at = time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        return bool(self._value and self._value.get('stale'))
+
+    @property
+    def version(self) -> Optional[int]:
+        """Версия настроек в кеше (None - значения нет)"""
+        if not self._value:
+            return None
+        return int(self._value.get('version') or 0)
+
+    def _load_snapshot(self) -> None:
+        """Прочитать настройки с диска (синхронно, при старте)"""
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            settings = snapshot['settings']
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading settings snapshot {self.snapshot_path}: {e}")
+            return
+        self._saved = settings
+        self.snapshot_saved_at = snapshot.get('saved_at')
+        # _fetched_at = 0: первый get отдаст снимок и запустит обновление из API
+        self._value = dict(settings, stale=True)
+
+    def _save_snapshot(self, value: Dict[str, Any]) -> None:
+        """Записать настройки на диск, если они изменились (запись атомарная).
+
+        Не записываются ответы без версии (версия 0 - настройки по умолчанию,
+        которые старые версии админки отдавали при сбое базы) и версии старше
+        уже сохраненной: снимок остается последними настоящими настройками.
+        """
+        if not self.snapshot_path or value.get('stale') or value == self._saved:
+            return
+        version = int(value.get('version') or 0)
+        if version <= 0 or (self._saved and version < int(self._saved.get('version') or 0)):
+            return
+        # Несколько килобайт и только при изменении настроек - пишем сразу, без потока
+        path = Path(self.snapshot_path)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            saved_at = time.time()
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': value.get('version'), 'saved_at': saved_at, 'settings': value},
+                          f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Error saving settings snapshot {self.snapshot_path}: {e}")
+            return
+        self._saved = value
+        self.snapshot_saved_at = saved_at
+
+    def invalidate(self) -> None:
+        """Пометить значение устаревшим (следующий get запустит обновление)"""
+        self._fetched_at = 0.0
+
+    def refresh(self) -> asyncio.Task:
+        """Обновить значение сейчас, не дожидаясь ttl (до ответа отдается прежнее)"""
+        self.invalidate()
+        return self._ensure_refresh()
+
+    def _ensure_refresh(self) -> asyncio.Task:
+        """Запустить обновление, если оно еще не идет (single-flight)"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self) -> Dict[str, Any]:
+        self.refreshes += 1
+        try:
+            value = await self._loader()
+        except Exception as e:
+            print(f"Error refreshing payment settings: {e}")
+            value = {}
+        if value:
+            self.set(value)
+            return value
+        # Пустой ответ (ошибка API) не кешируем - оставляем прежнее значение с флагом stale
+        self.errors += 1
+        if self._value is None:
+            return {}
+        if not self._value.get('stale'):
+            print("Payment settings API unavailable, serving last known settings (stale)")
+            self._value = dict(self._value, stale=True)
+        return self._value
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий/промахов кеша"""
+        age = time.monotonic() - self._fetched_at if self._value is not None else None
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'errors': self.errors,
+            'age': age,
+            'ttl': self.ttl,
+            'stale': self.stale,
+            'version': self.version,
+            'snapshot_age': time.time() - self.snapshot_saved_at if self.snapshot_saved_at else None,
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from settings_cache import SettingsCache
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsFeed:
+    """Подписка на изменения настроек платежей (long-poll к админке).
+
+    Запрос висит до сохранения настроек в админке (или до wait секунд) и
+    возвращает новые настройки с номером версии - они сразу кладутся в кеш.
+    Ответ "без изменений" подтверждает кеш, если в нем та же версия, что в
+    подписке (иначе кеш перечитывается), поэтому пока подписка работает, кеш
+    не ходит за настройками сам. Если админка
+    недоступна, подписка переподключается с задержкой, а кеш обновляется по ttl.
+
+    linked - кеши данных, при изменении которых админка тоже повышает версию
+    (активный реквизит): на новую версию они перечитываются сразу.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[int, float], Awaitable[Dict[str, Any]]],
+        cache: SettingsCache,
+        wait: float = 25.0,
+        retry_max: float = 30.0,
+        linked: Iterable[SettingsCache] = (),
+    ):
+        self._poll = poll
+        self._cache = cache
+        self.wait = wait
+        self.retry_max = retry_max
+        self._linked = list(linked)
+        self.version = 0
+        self._task: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.errors = 0
+        self.connected_at: Optional[float] = None
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                data = await self._poll(self.version, self.wait)
+                if not data.get('success'):
+                    raise RuntimeError(data.get('error') or 'unsuccessful response')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                failures += 1
+                self.connected_at = None
+                delay = min(self.retry_max, 2 ** failures) * random.uniform(0.5, 1.0)
+                logger.warning(f"Settings feed error: {e}; повтор через {delay:.1f} сек")
+                await asyncio.sleep(delay)
+                continue
+
+            failures = 0
+            if self.connected_at is None:
+                self.connected_at = time.monotonic()
+            version = int(data.get('version') or 0)
+            if data.get('changed') and data.get('settings'):
+                self._cache.set(data['settings'])
+                for cache in self._linked:
+                    cache.refresh()
+                self.updates += 1
+                logger.info(f"Настройки обновлены: версия {version}")
+            elif self._cache.version == version:
+                self._cache.touch()
+            else:
+                # В кеше другая версия (например, получена во время сбоя) - не продлеваем ее
+                self._cache.refresh()
+            self.version = version
+
+    def start(self) -> None:
+        if self.wait > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'connected': self.connected_at is not None,
+            'updates': self.updates,
+            'errors': self.errors,
+        }
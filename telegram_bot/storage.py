@@ -0,0 +1,426 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis нужен только для FSM_STORAGE=redis
+    aioredis = None
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# (ключ, состояние, данные)
+Row = Tuple[str, Optional[str], Dict[str, Any]]
+
+
+def key_to_str(key: StorageKey) -> str:
+    """Строковый ключ записи FSM"""
+    return ':'.join(str(part) for part in (
+        key.bot_id,
+        key.chat_id,
+        key.user_id,
+        key.thread_id or '',
+        key.business_connection_id or '',
+        key.destiny,
+    ))
+
+
+class SQLiteBackend:
+    """Хранение состояний FSM в SQLite (файл на диске)"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS fsm_states ('
+                ' key TEXT PRIMARY KEY,'
+                ' state TEXT,'
+                ' data TEXT NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+
+    def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT state, data FROM fsm_states WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1])
+
+    def _save_many(self, rows: List[Row]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET state = excluded.state, '
+                'data = excluded.data, updated_at = excluded.updated_at',
+                [(key, state, json.dumps(data, ensure_ascii=False), now) for key, state, data in rows]
+            )
+            self._conn.commit()
+
+    def _delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany('DELETE FROM fsm_states WHERE key = ?', [(key,) for key in keys])
+            self._conn.commit()
+
+    def _find_idle(self, cutoffs: Dict[str, float]) -> List[Row]:
+        rows: List[Row] = []
+        with self._lock:
+            for group, cutoff in cutoffs.items():
+                rows.extend(
+                    (key, state, json.loads(data))
+                    for key, state, data in self._conn.execute(
+                        'SELECT key, state, data FROM fsm_states WHERE state LIKE ? AND updated_at < ?',
+                        (f'{group}:%', cutoff)
+                    )
+                )
+        return rows
+
+    async def load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        return await asyncio.to_thread(self._load, key)
+
+    async def find_idle(self, cutoffs: Dict[str, float]) -> List[Row]:
+        """Записи в группах состояний, не менявшиеся с момента cutoff (unix time)"""
+        return await asyncio.to_thread(self._find_idle, cutoffs)
+
+    async def save_many(self, rows: List[Row]) -> None:
+        await asyncio.to_thread(self._save_many, rows)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await asyncio.to_thread(self._delete_many, keys)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisBackend:
+    """Хранение состояний FSM в Redis (или любом сервере с протоколом Redis)"""
+
+    def __init__(self, url: str, prefix: str = 'fsm:'):
+        if aioredis is None:
+            raise RuntimeError('Для FSM_STORAGE=redis установите пакет redis')
+        self._redis = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        raw = await self._redis.hgetall(self._prefix + key)
+        state = raw.get(b'state')
+        data = raw.get(b'data')
+        return (
+            state.decode() if state else None,
+            json.loads(data) if data else {},
+        )
+
+    async def save_many(self, rows: List[Row]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, state, data in rows:
+                name = self._prefix + key
+                pipe.hset(name, mapping={
+                    'data': json.dumps(data, ensure_ascii=False),
+                    'updated_at': time.time(),
+                })
+                if state is None:
+                    pipe.hdel(name, 'state')
+                else:
+                    pipe.hset(name, 'state', state)
+            await pipe.execute()
+
+    async def delete_many(self, keys: List[str]) -> None:
+        if keys:
+            await self._redis.delete(*(self._prefix + key for key in keys))
+
+    async def find_idle(self, cutoffs: Dict[str, float]) -> List[Row]:
+        """Записи в группах состояний, не менявшиеся с момента cutoff (unix time)"""
+        rows: List[Row] = []
+        async for name in self._redis.scan_iter(match=f'{self._prefix}*', count=500):
+            state, updated_at, data = await self._redis.hmget(name, 'state', 'updated_at', 'data')
+            if not state or not updated_at:
+                continue
+            state = state.decode()
+            cutoff = cutoffs.get(state.split(':', 1)[0])
+            if cutoff is not None and float(updated_at) < cutoff:
+                key = name.decode()[len(self._prefix):]
+                rows.append((key, state, json.loads(data) if data else {}))
+        return rows
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'loaded_at', 'touched_at')
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]):
+        self.state = state
+        self.data = data
+        self.loaded_at = time.monotonic()
+        self.touched_at = self.loaded_at
+
+
+def _state_group(state: Optional[str]) -> Optional[str]:
+    """Группа состояния: 'WithdrawStates:waiting_for_qr_photo' -> 'WithdrawStates'"""
+    return state.split(':', 1)[0] if state else None
+
+
+def _size(value: Any) -> int:
+    """Примерный размер значения в байтах (как оно хранится в backend)"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+class CachedStorage(BaseStorage):
+    """Хранилище FSM с кешем чтения в памяти и отложенной пакетной записью.
+
+    get_data/update_data работают с копией в памяти; изменения копятся и
+    раз в flush_interval секунд одним пакетом уходят в backend.
+    cache_ttl > 0 - через сколько секунд перечитывать чистую запись из backend
+    (нужно, если с одним хранилищем работают несколько процессов бота).
+
+    Брошенные диалоги сбрасываются: если запись простояла в группе состояний
+    дольше idle_timeouts[группа] секунд, состояние очищается, а из данных
+    остаются только keep_keys (например, выбранный язык). Записи без состояния,
+    не использовавшиеся memory_idle секунд, выгружаются из памяти.
+    """
+
+    def __init__(
+        self,
+        backend,
+        flush_interval: float = 0.5,
+        cache_ttl: float = 0,
+        idle_timeouts: Optional[Dict[str, float]] = None,
+        keep_keys: Tuple[str, ...] = (),
+        memory_idle: float = 0,
+        eviction_interval: float = 60,
+    ):
+        self._backend = backend
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.idle_timeouts = {group: t for group, t in (idle_timeouts or {}).items() if t > 0}
+        self.keep_keys = keep_keys
+        self.memory_idle = memory_idle
+        self.eviction_interval = eviction_interval
+        self.evicted_total = 0
+        self._cache: Dict[str, _Record] = {}
+        self._dirty: set = set()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._evict_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self) -> None:
+        """Запустить фоновую запись изменений и очистку брошенных диалогов"""
+        if self._task is None and not self._closed:
+            self._task = asyncio.create_task(self._run())
+            if self.idle_timeouts or self.memory_idle:
+                self._evict_task = asyncio.create_task(self._run_eviction())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing FSM storage: {e}")
+
+    async def _run_eviction(self) -> None:
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    report = self.memory_report()
+                    logger.info(
+                        f"FSM: сброшено брошенных диалогов: {evicted}, "
+                        f"в памяти {report['records']} записей, {report['bytes']} байт"
+                    )
+            except Exception as e:
+                logger.error(f"Error evicting idle FSM states: {e}")
+
+    def _strip(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: data[k] for k in self.keep_keys if k in data}
+
+    async def evict_idle(self) -> int:
+        """Сбросить брошенные диалоги в памяти и в backend, вернуть их количество"""
+        evicted = 0
+        now = time.monotonic()
+        for name, record in list(self._cache.items()):
+            idle = now - record.touched_at
+            timeout = self.idle_timeouts.get(_state_group(record.state))
+            if timeout and idle > timeout:
+                record.state = None
+                record.data = self._strip(record.data)
+                self._dirty.add(name)
+                evicted += 1
+            elif (
+                self.memory_idle and idle > self.memory_idle
+                and record.state is None and name not in self._dirty
+            ):
+                # Запись без состояния уже сохранена - при обращении загрузится снова
+                del self._cache[name]
+
+        # Записи, которых нет в памяти (например, оставшиеся с прошлого запуска)
+        if self.idle_timeouts:
+            wall_now = time.time()
+            cutoffs = {group: wall_now - t for group, t in self.idle_timeouts.items()}
+            rows = [row for row in await self._backend.find_idle(cutoffs) if row[0] not in self._cache]
+            keep = [(key, None, self._strip(data)) for key, _, data in rows if self._strip(data)]
+            drop = [key for key, _, data in rows if not self._strip(data)]
+            if keep:
+                await self._backend.save_many(keep)
+            if drop:
+                await self._backend.delete_many(drop)
+            evicted += len(rows)
+
+        self.evicted_total += evicted
+        return evicted
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Размер данных FSM в памяти по состояниям и по ключам данных"""
+        by_state: Dict[str, Dict[str, int]] = {}
+        by_key: Dict[str, int] = {}
+        total = 0
+        for record in self._cache.values():
+            size = 0
+            for data_key, value in record.data.items():
+                value_size = len(data_key) + _size(value)
+                by_key[data_key] = by_key.get(data_key, 0) + value_size
+                size += value_size
+            entry = by_state.setdefault(record.state or '-', {'records': 0, 'bytes': 0})
+            entry['records'] += 1
+            entry['bytes'] += size
+            total += size
+        return {
+            'records': len(self._cache),
+            'dirty': len(self._dirty),
+            'bytes': total,
+            'evicted_total': self.evicted_total,
+            'by_state': by_state,
+            'by_key': dict(sorted(by_key.items(), key=lambda item: item[1], reverse=True)),
+        }
+
+    async def flush(self) -> None:
+        """Записать накопленные изменения в backend"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            rows: List[Row] = []
+            empty: List[str] = []
+            for key in keys:
+                record = self._cache.get(key)
+                if record is None or (record.state is None and not record.data):
+                    empty.append(key)
+                else:
+                    # Копия: данные могут измениться, пока идет запись
+                    rows.append((key, record.state, dict(record.data)))
+            try:
+                if rows:
+                    await self._backend.save_many(rows)
+                if empty:
+                    await self._backend.delete_many(empty)
+            except Exception:
+                # Вернем ключи в очередь, чтобы записать при следующей попытке
+                self._dirty |= keys
+                raise
+
+    def _is_fresh(self, key: str, record: _Record) -> bool:
+        if not self.cache_ttl or key in self._dirty:
+            return True
+        return time.monotonic() - record.loaded_at < self.cache_ttl
+
+    async def _record(self, key: StorageKey) -> _Record:
+        """Запись из кеша или из backend (одна загрузка на ключ)"""
+        name = key_to_str(key)
+        record = self._cache.get(name)
+        if record is not None and self._is_fresh(name, record):
+            record.touched_at = time.monotonic()
+            return record
+
+        future = self._loading.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._backend.load(name))
+            self._loading[name] = future
+            future.add_done_callback(lambda _: self._loading.pop(name, None))
+        state, data = await asyncio.shield(future)
+
+        # Пока шла загрузка, запись могли изменить - локальные изменения важнее
+        record = self._cache.get(name)
+        if record is None or not self._is_fresh(name, record):
+            record = _Record(state, data)
+            self._cache[name] = record
+        return record
+
+    def _touch(self, key: StorageKey, record: _Record) -> None:
+        name = key_to_str(key)
+        record.loaded_at = record.touched_at = time.monotonic()
+        self._cache[name] = record
+        self._dirty.add(name)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def close(self) -> None:
+        """Остановить фоновую запись, дописать изменения и закрыть backend"""
+        if self._closed:
+            return
+        self._closed = True
+        for task in (self._task, self._evict_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._evict_task = None
+        await self.flush()
+        await self._backend.close()
+
+
+def create_storage() -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE (sqlite, redis или memory)"""
+    if Config.FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    if Config.FSM_STORAGE == 'redis':
+        backend = RedisBackend(Config.FSM_REDIS_URL)
+    else:
+        backend = SQLiteBackend(Config.FSM_SQLITE_PATH)
+    return CachedStorage(
+        backend,
+        flush_interval=Config.FSM_FLUSH_INTERVAL,
+        cache_ttl=Config.FSM_CACHE_TTL,
+        idle_timeouts=Config.FSM_IDLE_TIMEOUTS,
+        keep_keys=Config.FSM_PERSISTENT_KEYS,
+        memory_idle=Config.FSM_MEMORY_IDLE,
+        eviction_interval=Config.FSM_EVICTION_INTERVAL,
+    )
@@ -0,0 +1,61 @@
+import time
+from typing import Dict, Optional, Tuple
+
+
+class SubscriptionCache:
+    """Кеш результатов проверки подписки на канал.
+
+    Подписка кешируется на positive_ttl, ее отсутствие - на negative_ttl
+    (обычно короче: пользователь может подписаться в любой момент).
+    Обновления chat_member по каналу записываются сразу, без ожидания TTL.
+    """
+
+    def __init__(self, positive_ttl: float, negative_ttl: float, max_size: int = 100000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: Dict[Tuple[str, int], Tuple[bool, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    @staticmethod
+    def _key(channel: str, user_id: int) -> Tuple[str, int]:
+        return channel.lstrip('@').lower(), user_id
+
+    def get(self, channel: str, user_id: int) -> Optional[bool]:
+        """Закешированный статус подписки или None, если его нужно проверить"""
+        entry = self._entries.get(self._key(channel, user_id))
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, channel: str, user_id: int, subscribed: bool) -> None:
+        ttl = self.positive_ttl if subscribed else self.negative_ttl
+        if ttl <= 0:
+            self.invalidate(channel, user_id)
+            return
+        if len(self._entries) >= self.max_size:
+            self._prune()
+        self._entries[self._key(channel, user_id)] = (subscribed, time.monotonic() + ttl)
+
+    def invalidate(self, channel: str, user_id: int) -> None:
+        self._entries.pop(self._key(channel, user_id), None)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[1] >= now}
+        # Если все записи свежие - освобождаем место, удаляя самые старые
+        if len(self._entries) >= self.max_size:
+            for key in list(self._entries)[:len(self._entries) // 10 or 1]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'chat_member_updates': self.updates,
+        }
@@ -0,0 +1,111 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+from translations import get_text
+
+# Группа для обработчиков без флага throttle
+DEFAULT_GROUP = 'default'
+
+
+def parse_rate(value: str) -> Optional[Tuple[float, float]]:
+    """'5/60' -> (5 действий, за 60 секунд); пусто или 0 - без ограничения"""
+    if not value or value.strip() in ('0', 'off'):
+        return None
+    count, _, period = value.partition('/')
+    return float(count), float(period or 1)
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated', 'warned')
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.warned = False
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты действий пользователя (token bucket на пользователя и группу).
+
+    Группа задается флагом обработчика: @router.message(..., flags={'throttle': 'deposit'}).
+    Лишние обновления отбрасываются до вызова обработчика, то есть до запросов
+    к API. Пользователь получает одно предупреждение, пока не накопится новое
+    разрешенное действие; остальные лишние обновления не стоят ни одного запроса.
+    """
+
+    def __init__(self, limits: Dict[str, str], max_buckets: int = 100000):
+        self.limits = {group: parse_rate(value) for group, value in limits.items()}
+        self.max_buckets = max_buckets
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        self.passed = 0
+        self.dropped: Dict[str, int] = {}
+
+    def _bucket(self, user_id: int, group: str) -> Optional[TokenBucket]:
+        limit = self.limits.get(group)
+        if limit is None:
+            return None
+        key = (user_id, group)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune()
+            count, period = limit
+            bucket = self._buckets[key] = TokenBucket(count, count / period)
+        return bucket
+
+    def _prune(self) -> None:
+        # Полные ведра ничем не отличаются от новых - их можно забыть
+        now = time.monotonic()
+        self._buckets = {k: b for k, b in self._buckets.items() if not b.full(now)}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get('event_from_user')
+        group = get_flag(data, 'throttle', default=DEFAULT_GROUP)
+        bucket = self._bucket(user.id, group) if user is not None else None
+        if bucket is None or bucket.take():
+            if bucket is not None:
+                bucket.warned = False
+            self.passed += 1
+            return await handler(event, data)
+
+        self.dropped[group] = self.dropped.get(group, 0) + 1
+        if not bucket.warned:
+            bucket.warned = True
+            if isinstance(event, (CallbackQuery, Message)):
+                await event.answer(await self._text(data))
+        return None
+
+    @staticmethod
+    async def _text(data: Dict[str, Any]) -> str:
+        state = data.get('state')
+        lang = (await state.get_data()).get('language', 'ru') if state is not None else 'ru'
+        return get_text(lang, 'start', 'throttled')
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'buckets': len(self._buckets),
+            'passed': self.passed,
+            'dropped': dict(self.dropped),
+        }
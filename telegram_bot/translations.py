@@ -1,4 +1,6 @@
 # Переводы для бота
+import hashlib
+import json
 
 TRANSLATIONS = {
     'ru': {
@@ -15,6 +17,7 @@ TRANSLATIONS = {
             'check_subscription': '✅ Я подписался',
             'not_subscribed': 'Пожалуйста, сначала подпишитесь на канал',
             'subscription_error': 'Ошибка проверки подписки',
+            'throttled': '⏳ Слишком часто. Подождите немного и попробуйте снова',
         },
         'menu': {
             'deposit': '💰 Пополнить',
@@ -92,6 +95,7 @@ TRANSLATIONS = {
             'check_subscription': '✅ Мен жазылдым',
             'not_subscribed': 'Алгач каналга жазылыңыз',
             'subscription_error': 'Жазылууну текшерүүдө ката',
+            'throttled': '⏳ Өтө тез-тез. Бир аз күтүп, кайра аракет кылыңыз',
         },
         'menu': {
             'deposit': '💰 Толтуруу',
@@ -157,6 +161,11 @@ TRANSLATIONS = {
     }
 }
 
+# Версия переводов: меняется вместе с текстами (ключ кеша клавиатур)
+TRANSLATIONS_VERSION = hashlib.sha1(
+    json.dumps(TRANSLATIONS, sort_keys=True, ensure_ascii=False).encode('utf-8')
+).hexdigest()[:12]
+
 def get_text(lang: str, category: str, key: str, default: str = None, **kwargs) -> str:
     """Получить переведенный текст"""
     if lang not in TRANSLATIONS:
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from metrics import percentile
+
+
+class _UserQueue:
+    __slots__ = ('lock', 'size')
+
+    def __init__(self):
+        # Ожидающие asyncio.Lock просыпаются в порядке очереди (FIFO)
+        self.lock = asyncio.Lock()
+        self.size = 0
+
+
+class OrderedUpdatesMiddleware(BaseMiddleware):
+    """Ограничение параллельной обработки обновлений с порядком по пользователю.
+
+    Обновления одного пользователя обрабатываются строго по очереди (двойное
+    нажатие "Отмена" или два фото подряд не гоняются за state.update_data),
+    обновления разных пользователей - параллельно, но одновременно не больше
+    workers обработчиков. Место в общем лимите занимается только после своей
+    очереди пользователя, чтобы ожидающие обновления не держали слоты.
+
+    Очередь ограничена: сверх queue_limit ожидающих обновлений всего и
+    user_queue_limit у одного пользователя новые обновления отбрасываются до
+    обработчика (0 - без ограничения).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_limit: int = 0,
+        user_queue_limit: int = 0,
+        latency_samples: int = 1000,
+    ):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.user_queue_limit = user_queue_limit
+        self._budget = asyncio.Semaphore(workers)
+        self._queues: Dict[int, _UserQueue] = {}
+        self._waits = deque(maxlen=latency_samples)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.max_user_depth = 0
+        self.processed = 0
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get('event_from_user')
+        queue = self._queues.get(user.id) if user is not None else None
+        if (self.queue_limit and self.waiting >= self.queue_limit) or (
+            self.user_queue_limit and queue is not None and queue.size >= self.user_queue_limit
+        ):
+            self.dropped += 1
+            return None
+        if user is not None:
+            if queue is None:
+                queue = self._queues[user.id] = _UserQueue()
+            queue.size += 1
+            self.max_user_depth = max(self.max_user_depth, queue.size)
+
+        enqueued = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = False
+        try:
+            if queue is not None:
+                await queue.lock.acquire()
+            try:
+                async with self._budget:
+                    started = True
+                    self.waiting -= 1
+                    self._waits.append(time.monotonic() - enqueued)
+                    self.running += 1
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+            finally:
+                if queue is not None:
+                    queue.lock.release()
+        finally:
+            if not started:
+                # Отменено в очереди, до обработчика
+                self.waiting -= 1
+            if queue is not None:
+                queue.size -= 1
+                if queue.size == 0:
+                    del self._queues[user.id]
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'users_queued': len(self._queues),
+            'max_user_depth': self.max_user_depth,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'wait_ms_p50': percentile(waits, 0.5, 1000),
+            'wait_ms_p99': percentile(waits, 0.99, 1000),
+            'wait_ms_max': percentile(waits, 1.0, 1000),
+        }
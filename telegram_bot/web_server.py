@@ -0,0 +1,89 @@
+import asyncio
+import hmac
+import logging
+from typing import Any, Callable, Dict
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import Config
+from file_proxy import setup_file_proxy
+
+logger = logging.getLogger(__name__)
+
+# Источники статистики для GET /stats: имя -> функция без аргументов
+STATS_PROVIDERS: Dict[str, Callable[[], Any]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], Any]) -> None:
+    """Добавить раздел в ответ GET /stats"""
+    STATS_PROVIDERS[name] = provider
+
+
+async def health(request: web.Request) -> web.Response:
+    """Проверка живости для балансировщика"""
+    return web.json_response({'ok': True})
+
+
+async def stats(request: web.Request) -> web.Response:
+    """Внутренняя статистика бота (доступ по заголовку X-Stats-Token)"""
+    if not hmac.compare_digest(request.headers.get('X-Stats-Token', ''), Config.STATS_TOKEN):
+        return web.json_response({'error': 'unauthorized'}, status=401)
+    return web.json_response({name: provider() for name, provider in STATS_PROVIDERS.items()})
+
+
+def web_server_needed() -> bool:
+    """Нужен ли HTTP-сервер в режиме polling (прокси файлов или статистика)"""
+    return bool(Config.BOT_PUBLIC_URL or Config.STATS_TOKEN)
+
+
+def create_web_app(dp: Dispatcher, bot: Bot, webhook: bool) -> web.Application:
+    """Собрать aiohttp-приложение бота"""
+    app = web.Application()
+    app.router.add_get('/health', health)
+    if Config.STATS_TOKEN:
+        app.router.add_get('/stats', stats)
+    if Config.BOT_PUBLIC_URL:
+        proxy = setup_file_proxy(app, bot)
+        register_stats('file_cache', proxy.cache.stats)
+
+    if webhook:
+        # Telegram присылает секрет в заголовке X-Telegram-Bot-Api-Secret-Token,
+        # запросы с неверным секретом отклоняются с 401
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=Config.WEBHOOK_SECRET,
+        ).register(app, path=Config.WEBHOOK_PATH)
+        setup_application(app, dp, bot=bot)
+    return app
+
+
+async def start_web_server(dp: Dispatcher, bot: Bot, webhook: bool = False) -> web.AppRunner:
+    """Запустить встроенный HTTP-сервер, вернуть runner для остановки"""
+    app = create_web_app(dp, bot, webhook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"HTTP-сервер бота слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}")
+    return runner
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Запустить встроенный HTTP-сервер и (если задан WEBHOOK_URL) зарегистрировать webhook"""
+    runner = await start_web_server(dp, bot, webhook=True)
+    logger.info(f"Webhook принимается по пути {Config.WEBHOOK_PATH}")
+
+    # Без WEBHOOK_URL сервер работает локально: обновления можно отправлять POST-запросами вручную
+    if Config.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=f'{Config.WEBHOOK_URL.rstrip("/")}{Config.WEBHOOK_PATH}',
+            secret_token=Config.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info(f"Webhook зарегистрирован: {Config.WEBHOOK_URL}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
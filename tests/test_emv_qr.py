@@ -0,0 +1,42 @@
+"""Python-сборка QR совпадает с admin/lib/emv-qr.ts байт в байт.
+
+Эталоны в fixtures/emv_qr_golden.json получены из TS-кода:
+    cd admin && npx tsx scripts/emv-qr-golden.ts > ../tests/fixtures/emv_qr_golden.json
+"""
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+GOLDEN = json.loads((ROOT / 'tests' / 'fixtures' / 'emv_qr_golden.json').read_text(encoding='utf-8'))
+
+# Общий модуль бота и payment_site
+_spec = importlib.util.spec_from_file_location('emv_qr', ROOT / 'telegram_bot' / 'emv_qr.py')
+emv_qr = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(emv_qr)
+
+
+def _id(vector):
+    return f"{vector['requisite']}-{vector['amount']}-{vector['bank']}"
+
+
+@pytest.mark.parametrize('vector', GOLDEN, ids=_id)
+def test_qr_hash_matches_ts(vector):
+    assert emv_qr.build_qr_hash(vector['requisite'], vector['amount']) == vector['response']['qr_hash']
+
+
+@pytest.mark.parametrize('vector', GOLDEN, ids=_id)
+def test_qr_response_matches_ts(vector):
+    response = emv_qr.build_qr_response(
+        vector['requisite'], vector['amount'], vector['bank'], vector['enabled_banks']
+    )
+    assert response == vector['response']
+
+
+def test_golden_covers_edge_cases():
+    requisites = {vector['requisite'] for vector in GOLDEN}
+    amounts = {vector['amount'] for vector in GOLDEN}
+    assert any(not requisite.isascii() for requisite in requisites)
+    assert any(round(amount * 100) != amount * 100 for amount in amounts)